@@ -20,6 +20,12 @@ app.use(express.json());
 app.use(express.urlencoded({ extended: true }));
 app.use(cors());
 
+// Images mirrored by images-scraper/image_mirror.py (content-addressed, so they never change)
+app.use('/images', express.static(process.env.IMAGE_MIRROR_DIR || 'images-scraper/image_mirror', {
+  maxAge: '365d',
+  immutable: true,
+}));
+
 // Request logger middleware
 
 
@@ -0,0 +1,173 @@
+import re
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse, urlencode, parse_qsl, urlunparse
+from bs4 import BeautifulSoup
+from checkpoint_store import CheckpointStore
+from find_grocery_image import (
+    HttpSearchClient, parse_product_tiles, load_existing_json, save_to_json, JSON_OUTPUT_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ROOT_URL = "https://www.shufersal.co.il/online/he/"
+CATEGORY_PATH_PATTERN = re.compile(r"^/online/he/(?:c/)?A\d{2,}/?$")  # Category codes: A07, A0708, ...
+CRAWL_WORKERS = 10
+MAX_PAGES_PER_CATEGORY = 100  # Safety cap for listings whose pagination never runs dry
+CRAWL_CHECKPOINT_FILE = "crawl_checkpoint.jsonl"
+
+
+def listing_page_url(category_url: str, page: int) -> str:
+    """URL of one page of a category listing (page 0 is the category URL itself)."""
+    if page == 0:
+        return category_url
+    parsed = urlparse(category_url)
+    query = dict(parse_qsl(parsed.query))
+    query["page"] = str(page)
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+def parse_category_links(html: str, page_url: str) -> Set[str]:
+    """Absolute URLs of the category pages linked from a page (menus, sub-category tiles)."""
+    links = set()
+    for anchor in BeautifulSoup(html, "html.parser").select("a[href]"):
+        url = urljoin(page_url, anchor["href"])
+        parsed = urlparse(url)
+        if parsed.netloc == urlparse(CATALOG_ROOT_URL).netloc and CATEGORY_PATH_PATTERN.match(parsed.path):
+            links.add(urlunparse(parsed._replace(query="", fragment="")))
+    return links
+
+
+class CatalogCrawler:
+    """
+    Harvests product tiles by walking the category tree instead of searching item by item.
+
+    Workers pull category URLs from a shared queue, page through each listing until a
+    page shows nothing that the listing's earlier pages didn't (products seen in other
+    categories don't count), and enqueue every newly discovered category. Each fetched
+    listing page is recorded in the checkpoint (keyed by its URL), so an interrupted
+    crawl resumes without fetching those pages again - except page 0, which is fetched
+    again for its category links.
+    """
+
+    def __init__(self, http_client: HttpSearchClient, checkpoint: Optional[CheckpointStore] = None,
+                 workers: int = CRAWL_WORKERS, max_pages: int = MAX_PAGES_PER_CATEGORY):
+        self.http_client = http_client
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.max_pages = max_pages
+        self.products: Dict[str, str] = dict(checkpoint.products) if checkpoint else {}
+        self.seen_categories: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.stats = {'categories': 0, 'pages': 0, 'failed_pages': 0, 'resumed_pages': 0}
+
+    def _enqueue(self, category_urls: Set[str]):
+        for url in category_urls:
+            if url not in self.seen_categories:
+                self.seen_categories.add(url)
+                self.queue.put_nowait(url)
+
+    async def _crawl_category(self, category_url: str):
+        self.stats['categories'] += 1
+        listing_names: Set[str] = set()  # Tiles on this listing's earlier pages
+        for page in range(self.max_pages):
+            page_url = listing_page_url(category_url, page)
+            resumed = bool(self.checkpoint and self.checkpoint.is_searched(page_url))
+            # The checkpoint doesn't keep category links, so a resumed page 0 is fetched again
+            if resumed and page > 0:
+                self.stats['resumed_pages'] += 1
+                continue
+
+            fetched = await self.http_client.fetch_page(page_url)
+            if fetched is None:
+                self.stats['failed_pages'] += 1
+                if resumed:
+                    continue
+                return
+            html, final_url = fetched
+            self.stats['pages'] += 1
+            if page == 0:
+                self._enqueue(parse_category_links(html, final_url))
+
+            tiles = parse_product_tiles(html, final_url) or {}
+            new_tiles = sum(1 for name in tiles if name not in listing_names)
+            listing_names.update(tiles)
+            new_count = sum(1 for name in tiles if name not in self.products)
+            for name, url in tiles.items():
+                self.products.setdefault(name, url)
+            if self.checkpoint and not resumed:
+                self.checkpoint.record_search(page_url, tiles)
+            # A page repeating this listing's tiles is its end (or pagination being ignored)
+            if new_tiles == 0:
+                return
+            logger.info(f"📂 {category_url} page {page}: {new_count} new products | Total: {len(self.products)}")
+
+    async def _worker(self):
+        while True:
+            category_url = await self.queue.get()
+            try:
+                await self._crawl_category(category_url)
+            except Exception as e:
+                logger.error(f"💥 Crawling {category_url} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def crawl(self, root_url: str = CATALOG_ROOT_URL) -> Dict[str, str]:
+        """Crawl every category reachable from root_url and return {productName: imageUrl}."""
+        fetched = await self.http_client.fetch_page(root_url)
+        if fetched is None:
+            logger.error(f"❌ Could not load the catalog root {root_url}")
+            return self.products
+        self._enqueue(parse_category_links(*fetched))
+        logger.info(f"🗂️  Found {len(self.seen_categories)} top-level categories")
+
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.products
+
+
+async def main_crawl():
+    """Crawl the catalog and merge the harvested tiles into the scraped JSON file."""
+    logger.info("🚀 Starting CATALOG CRAWL of Shufersal category listings.")
+    http_client = HttpSearchClient()
+    checkpoint = CheckpointStore(CRAWL_CHECKPOINT_FILE)
+    try:
+        existing_data = await load_existing_json()
+        checkpoint.open()
+        await http_client.open()
+
+        crawler = CatalogCrawler(http_client, checkpoint)
+        products = await crawler.crawl()
+
+        merged = dict(existing_data)
+        new_products = 0
+        for name, url in products.items():
+            if name not in merged:
+                merged[name] = url
+                new_products += 1
+
+        if await save_to_json(merged):
+            checkpoint.discard()
+
+        print(f"\n🎉 CATALOG CRAWL COMPLETED!")
+        print(f"   🗂️  Categories crawled: {crawler.stats['categories']}")
+        print(f"   📄 Listing pages fetched: {crawler.stats['pages']} "
+              f"(resumed {crawler.stats['resumed_pages']}, failed {crawler.stats['failed_pages']})")
+        print(f"   📊 Products harvested: {len(products)}")
+        print(f"   ✨ New products added: {new_products}")
+        print(f"   📁 JSON saved to: {JSON_OUTPUT_FILE} (run save_image_scrape.py to match them)")
+        print("="*80)
+    finally:
+        checkpoint.close()
+        await http_client.close()
+        logger.info("🏁 Catalog crawl finished.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_crawl())
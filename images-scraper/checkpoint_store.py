@@ -0,0 +1,98 @@
+import json
+import os
+import logging
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "scrape_checkpoint.jsonl"
+FSYNC_INTERVAL = 200  # Records between fsync calls (every record is flushed to the OS immediately)
+
+
+class CheckpointStore:
+    """
+    Append-only JSONL log of completed searches and the products they found.
+
+    Each completed search appends its new products followed by a single "search"
+    record, so a search only counts as done once everything it found is on disk.
+    Replaying the log on startup restores both the searched terms and the products.
+    """
+
+    def __init__(self, filename: str = CHECKPOINT_FILE, fsync_interval: int = FSYNC_INTERVAL):
+        self.filename = filename
+        self.fsync_interval = fsync_interval
+        self.searched_terms: Set[str] = set()
+        self.products: Dict[str, str] = {}
+        self._file = None
+        self._unsynced = 0
+
+    def open(self):
+        """Replay the existing log (if any) and open it for appending."""
+        valid_size = self._replay()
+        self._file = open(self.filename, 'ab')
+        if self._file.tell() != valid_size:
+            # Drop a partially written trailing record left by a crash
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+        if self.searched_terms:
+            logger.info(f"♻️  Resuming from {self.filename}: {len(self.searched_terms)} searches, {len(self.products)} products")
+
+    def _replay(self) -> int:
+        """Load state from the log. Returns the byte size of the valid prefix."""
+        if not os.path.exists(self.filename):
+            return 0
+
+        valid_size = 0
+        with open(self.filename, 'rb') as f:
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    break
+                if record.get('type') == 'product':
+                    self.products.setdefault(record['name'], record['url'])
+                elif record.get('type') == 'search':
+                    self.searched_terms.add(record['term'])
+                valid_size += len(raw_line)
+        return valid_size
+
+    def record_search(self, term: str, products: Optional[Dict[str, str]] = None) -> int:
+        """Append a completed search and the products it found. Returns how many products were new."""
+        new_count = 0
+        lines = []
+        for name, url in (products or {}).items():
+            if name not in self.products:
+                self.products[name] = url
+                lines.append(json.dumps({'type': 'product', 'name': name, 'url': url}, ensure_ascii=False))
+                new_count += 1
+        lines.append(json.dumps({'type': 'search', 'term': term, 'found': new_count}, ensure_ascii=False))
+        self.searched_terms.add(term)
+
+        if self._file:
+            self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self._file.flush()
+            self._unsynced += len(lines)
+            if self._unsynced >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+        return new_count
+
+    def is_searched(self, term: str) -> bool:
+        """Check whether a search for this term already completed."""
+        return term in self.searched_terms
+
+    def close(self):
+        """Flush and close the log."""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Close and delete the log once its results were written to the final output."""
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
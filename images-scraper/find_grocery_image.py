@@ -5,11 +5,25 @@ import os
 import logging
 import signal
 import sys
-from typing import List, Dict, Optional, Set
-from urllib.parse import urljoin, urlparse
+import re
+import uuid
+from typing import List, Dict, Optional, Set, Tuple, AsyncIterator, AsyncIterable, Union
+from urllib.parse import urljoin, urlparse, quote_plus
 from playwright.async_api import async_playwright, Page, Browser, BrowserContext, TimeoutError as PlaywrightTimeoutError
+import aiohttp
+from bs4 import BeautifulSoup
+from checkpoint_store import CheckpointStore
+from search_cache import NegativeSearchCache
 import mysql.connector
 from mysql.connector import Error
+from image_db import AsyncDatabase
+from name_index import NameIndex, open_name_index
+from name_matcher import NameMatcher, find_name_match
+from save_image_scrape import ImageUpdateWriter
+from work_queue import WorkQueue, CLAIM_BATCH_SIZE
+import rate_limiter
+from rate_limiter import limiter_for_url, limiter_stats, looks_blocked, outcome_for_status, parse_retry_after
+from search_metrics import SearchMetrics, SearchTrace, span, mark_timeout
 
 # Configure logging
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(module)s - %(message)s'
@@ -22,22 +36,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configuration Constants
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'dev',
-    'password': 'dev123',
-    'database': 'groczi',
-    'port': 3306
-}
-
 # Shufersal-specific configuration based on HTML analysis
 BASE_URL = "https://www.shufersal.co.il/online/he/S"
+SEARCH_URL_TEMPLATE = "https://www.shufersal.co.il/online/he/search?text={query}"
 SEARCH_INPUT_SELECTOR = "input#js-site-search-input"
 SEARCH_BUTTON_SELECTOR = "button.js_search_button"
 PRODUCT_GRID_SELECTOR = "ul#mainProductGrid"
 PRODUCT_ITEM_SELECTOR = "ul#mainProductGrid > li.tileBlock"
 PRODUCT_IMAGE_SELECTOR = "a.imgContainer img.pic"
+PRODUCT_CODE_PATTERN = re.compile(r"(\d{13})$")  # data-product-code looks like "P_7290000000001"
+
+# Search timing configuration
+NAVIGATION_TIMEOUT_MS = 60000
+GRID_TIMEOUT_MS = 30000
+TILES_READY_TIMEOUT_MS = 5000
+# Pacing between searches is adaptive: every request to a host goes through its rate_limiter.HostLimiter
+
+# Search backend configuration ("http" = browserless with Playwright fallback, "browser" = Playwright only)
+SEARCH_BACKEND = os.getenv("IMAGE_SEARCH_BACKEND", "http")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+HTTP_WORKERS = 30
+HTTP_MAX_CONNECTIONS = 30
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_MAX_UNPARSEABLE = 20  # Consecutive responses without a product grid before HTTP is disabled
+MAX_FALLBACK_BROWSERS = 3
+FALLBACK_BROWSER_WAIT_SECONDS = 300  # How long a worker waits for a busy fallback browser before failing the search
+
+# Browser state reuse: one persistent profile (cookies + disk HTTP cache) per browser slot,
+# plus cookies shared between all slots and runs through a storage state file
+PERSISTENT_PROFILES = os.getenv("PLAYWRIGHT_PERSISTENT_PROFILES", "1") == "1"
+PROFILE_ROOT_DIR = os.getenv("PLAYWRIGHT_PROFILE_DIR", "playwright_profiles")
+STORAGE_STATE_FILE = os.getenv("PLAYWRIGHT_STORAGE_STATE", "playwright_storage_state.json")
+
+# Browser recycling for long runs
+RECYCLE_PAGE_EVERY = 200  # Searches before the page is replaced with a fresh one
+MEMORY_CHECK_EVERY = 25  # Searches between JS heap checks
+PAGE_HEAP_LIMIT_MB = int(os.getenv("PLAYWRIGHT_HEAP_LIMIT_MB", "512"))  # Heap size that triggers a browser restart
+TARGET_CLOSED_MARKERS = ("Target closed", "Target page, context or browser has been closed", "crashed")
 
 # Image validation constants
 VALID_IMAGE_HOST = "res.cloudinary.com"
@@ -45,9 +80,39 @@ VALID_IMAGE_PATH_CONTAINS = "/prod/product_images/"
 PLACEHOLDER_IMAGE_URL = "https://media.shufersal.co.il/product_images/default/M_P_default.png"
 PLACEHOLDER_PATTERNS = ["/fix.png", "placeholder", "default", "no-image"]
 
+# Streaming configuration
+STREAM_BATCH_SIZE = 500  # Rows fetched per keyset page
+QUEUE_ORDER = os.getenv("IMAGE_QUEUE_ORDER", "popularity")  # "popularity" (most used first) or "table" (itemCode order)
+
+# Popularity score = sum of weight * signal; store counts are log-scaled so widely stocked staples don't drown out user activity
+POPULARITY_WEIGHTS = {
+    'cart': 5.0,  # cart_item rows
+    'list': 3.0,  # list_item rows
+    'bookmark': 4.0,  # bookmark rows
+    'stores': 2.0,  # log2(1 + number of stores carrying the item)
+    'requests': 8.0,  # requests about the item in the last REQUEST_WINDOW_DAYS
+}
+REQUEST_WINDOW_DAYS = 90
+POPULARITY_TABLE = "image_popularity_rank"  # Scores materialized per ranking (keyed by a ranking id) for keyset paging
+STALE_RANKING_HOURS = 168  # Rankings left behind by crashed runs are purged after this
+
+CREATE_POPULARITY_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {POPULARITY_TABLE} (
+        rankingId CHAR(32) NOT NULL,
+        itemCode VARCHAR(20) NOT NULL,
+        score DOUBLE NOT NULL,
+        createdAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (rankingId, itemCode),
+        INDEX idx_popularity_rank (rankingId, score DESC, itemCode)
+    ) CHARACTER SET utf8mb4
+"""
+QUEUE_BATCHES_PER_WORKER = 4  # Bounded look-ahead of the scraping queue
+
 # Output configuration
 JSON_OUTPUT_FILE = "scraped_product_images.json"
-PROGRESS_JSON_FILE = "progress_scraped_products.json"
+
+# Work queue entry: an item name, or (itemCode, itemName) for barcode-first lookups
+QueueItem = Union[str, Tuple[str, str]]
 
 # Global variable for graceful shutdown
 scraped_data_global = {}
@@ -90,44 +155,134 @@ def setup_signal_handlers():
 
 
 class DatabaseManager:
-    """Handles all MySQL database operations."""
+    """Handles all MySQL database operations through the shared async connection pool."""
     
     def __init__(self, config: Dict = None):
-        self.config = config or DB_CONFIG
-        self.connection = None
-        self.cursor = None
+        self.db = AsyncDatabase(config, pool_name="find_grocery_image")
 
     async def connect(self):
-        """Establish database connection."""
-        try:
-            self.connection = mysql.connector.connect(**self.config)
-            self.cursor = self.connection.cursor(dictionary=True)
-            logger.info("✅ Successfully connected to the database.")
-        except mysql.connector.Error as err:
-            logger.error(f"❌ Error connecting to database: {err}")
-            raise
+        """Establish the database connection pool."""
+        await self.db.connect()
 
     async def disconnect(self):
-        """Close database connection."""
-        if self.connection and self.connection.is_connected():
-            if self.cursor:
-                self.cursor.close()
-            self.connection.close()
-            logger.info("✅ Successfully disconnected from the database.")
+        """Close the database connection pool."""
+        await self.db.close()
+
+    async def iter_all_product_names(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[str]]:
+        """
+        Stream distinct product names in batches, paginating on the itemCode primary key.
+        Names are de-duplicated across batches instead of with a full DISTINCT sort.
+        """
+        seen_names = set()
+        async for rows in self._iter_grocery_rows(
+                "itemName IS NOT NULL AND itemName != ''", batch_size):
+            batch = []
+            for row in rows:
+                if row['itemName'] not in seen_names:
+                    seen_names.add(row['itemName'])
+                    batch.append(row['itemName'])
+            if batch:
+                yield batch
+
+    async def iter_products_without_images(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[str]]:
+        """Stream names of products without images in batches, paginating on the itemCode primary key."""
+        async for rows in self._iter_grocery_rows(
+                "(imageUrl IS NULL OR imageUrl = '') AND itemName IS NOT NULL AND itemName != ''", batch_size):
+            yield [row['itemName'] for row in rows]
+
+    async def iter_items_without_images(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[Tuple[str, str]]]:
+        """Stream (itemCode, itemName) of products without images in batches (for barcode-first lookups)."""
+        async for rows in self._iter_grocery_rows(
+                "(imageUrl IS NULL OR imageUrl = '') AND itemName IS NOT NULL AND itemName != ''", batch_size):
+            yield [(row['itemCode'], row['itemName']) for row in rows]
+
+    async def iter_items_by_popularity(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[Tuple[str, str]]]:
+        """
+        Stream (itemCode, itemName) of products without images, highest popularity score first.
+        The scores are computed server-side in one aggregate INSERT ... SELECT into
+        POPULARITY_TABLE, then read back with keyset pagination on (score, itemCode), so
+        memory stays bounded by the batch size. Items that got an image while the ranking
+        is being streamed are skipped.
+        """
+        if not self.db.is_connected:
+            logger.error("❌ Database not connected. Call connect() first.")
+            return
+
+        ranking_id = uuid.uuid4().hex
+        ranked = await self._rank_items_by_popularity(ranking_id)
+        logger.info(f"📈 Ranked {ranked} items by popularity")
+        query = (f"SELECT p.itemCode, p.score, g.itemName, g.imageUrl FROM {POPULARITY_TABLE} p "
+                 f"JOIN grocery g ON g.itemCode = p.itemCode WHERE p.rankingId = %s {{after}} "
+                 f"ORDER BY p.score DESC, p.itemCode LIMIT %s")
+        try:
+            rows = await self.db.fetch_all(query.format(after=""), (ranking_id, batch_size))
+            while rows:
+                batch = [(row['itemCode'], row['itemName']) for row in rows if not row['imageUrl']]
+                if batch:
+                    yield batch
+                if len(rows) < batch_size:
+                    break
+                last = rows[-1]
+                rows = await self.db.fetch_all(
+                    query.format(after="AND (p.score < %s OR (p.score = %s AND p.itemCode > %s))"),
+                    (ranking_id, last['score'], last['score'], last['itemCode'], batch_size)
+                )
+        finally:
+            try:
+                await self.db.execute(f"DELETE FROM {POPULARITY_TABLE} WHERE rankingId = %s", (ranking_id,))
+            except Exception as e:
+                logger.warning(f"⚠️  Could not drop popularity ranking {ranking_id}: {e}")
+
+    async def _rank_items_by_popularity(self, ranking_id: str) -> int:
+        """Materialize the popularity scores of products without images under ranking_id. Returns the rows ranked."""
+        await self.db.execute(CREATE_POPULARITY_TABLE)
+        await self.db.execute(
+            f"DELETE FROM {POPULARITY_TABLE} WHERE createdAt < NOW() - INTERVAL %s HOUR", (STALE_RANKING_HOURS,)
+        )
+        w = POPULARITY_WEIGHTS
+        return await self.db.execute(f"""
+            INSERT INTO {POPULARITY_TABLE} (rankingId, itemCode, score)
+            SELECT %s, g.itemCode,
+                   COALESCE(c.n, 0) * {w['cart']} + COALESCE(l.n, 0) * {w['list']}
+                   + COALESCE(b.n, 0) * {w['bookmark']} + LOG2(1 + COALESCE(s.n, 0)) * {w['stores']}
+                   + COALESCE(r.n, 0) * {w['requests']} AS score
+            FROM grocery g
+            LEFT JOIN (SELECT itemCode, COUNT(*) AS n FROM cart_item GROUP BY itemCode) c ON c.itemCode = g.itemCode
+            LEFT JOIN (SELECT itemCode, COUNT(*) AS n FROM list_item GROUP BY itemCode) l ON l.itemCode = g.itemCode
+            LEFT JOIN (SELECT itemCode, COUNT(*) AS n FROM bookmark GROUP BY itemCode) b ON b.itemCode = g.itemCode
+            LEFT JOIN (SELECT itemCode, COUNT(*) AS n FROM store_grocery GROUP BY itemCode) s ON s.itemCode = g.itemCode
+            LEFT JOIN (SELECT item_id, COUNT(*) AS n FROM requests
+                       WHERE created_at >= NOW() - INTERVAL %s DAY GROUP BY item_id) r ON r.item_id = g.itemCode
+            WHERE (g.imageUrl IS NULL OR g.imageUrl = '') AND g.itemName IS NOT NULL AND g.itemName != ''
+        """, (ranking_id, REQUEST_WINDOW_DAYS))
+
+    async def _iter_grocery_rows(self, condition: str, batch_size: int) -> AsyncIterator[List[Dict]]:
+        """Keyset-paginate grocery rows matching a condition (itemCode > last seen, ordered by itemCode)."""
+        if not self.db.is_connected:
+            logger.error("❌ Database not connected. Call connect() first.")
+            return
+
+        query = (f"SELECT itemCode, itemName FROM grocery "
+                 f"WHERE itemCode > %s AND {condition} ORDER BY itemCode LIMIT %s")
+        last_item_code = ''
+        while True:
+            rows = await self.db.fetch_all(query, (last_item_code, batch_size))
+            if not rows:
+                break
+            last_item_code = rows[-1]['itemCode']
+            yield rows
+            if len(rows) < batch_size:
+                break
 
     async def get_all_product_names(self, limit: int = None) -> List[str]:
         """Get ALL product names from database for comprehensive scraping."""
-        if not self.cursor:
-            logger.error("❌ Database not connected. Call connect() first.")
-            return []
-        
         try:
-            query = "SELECT DISTINCT itemName FROM grocery WHERE itemName IS NOT NULL AND itemName != '' ORDER BY itemName"
-            if limit:
-                query += f" LIMIT {limit}"
-            
-            self.cursor.execute(query)
-            products = [row['itemName'] for row in self.cursor.fetchall() if row['itemName']]
+            products = []
+            async for batch in self.iter_all_product_names():
+                products.extend(batch)
+                if limit and len(products) >= limit:
+                    products = products[:limit]
+                    break
             logger.info(f"📦 Found {len(products)} total products in database.")
             return products
         except mysql.connector.Error as err:
@@ -136,51 +291,62 @@ class DatabaseManager:
 
     async def get_products_without_images(self, limit: int = None) -> List[str]:
         """Get list of product names that don't have images."""
-        if not self.cursor:
-            logger.error("Database not connected. Call connect() first.")
-            return []
-        
         try:
-            query = "SELECT itemName FROM grocery WHERE (imageUrl IS NULL OR imageUrl = '') AND itemName IS NOT NULL AND itemName != ''"
-            if limit:
-                query += f" LIMIT {limit}"
-            
-            self.cursor.execute(query)
-            products = [row['itemName'] for row in self.cursor.fetchall() if row['itemName']]
+            products = []
+            async for batch in self.iter_products_without_images():
+                products.extend(batch)
+                if limit and len(products) >= limit:
+                    products = products[:limit]
+                    break
             logger.info(f"Found {len(products)} products without images.")
             return products
         except mysql.connector.Error as err:
             logger.error(f"Error fetching products without images: {err}")
             return []
 
+    async def open_name_index(self) -> NameIndex:
+        """Refresh the memory-mapped name index with new itemCodes and open it for lookups."""
+        try:
+            return await open_name_index(self.db if self.db.is_connected else None)
+        except mysql.connector.Error as err:
+            logger.error(f"Error refreshing the name index: {err}")
+            return await open_name_index()
+
     async def get_all_item_names(self) -> Set[str]:
-        """Get all item names from database for matching purposes."""
-        if not self.cursor:
+        """Get all item names for matching purposes (read from the name index)."""
+        name_index = await self.open_name_index()
+        try:
+            item_names = {item_name for _, item_name in name_index.iter_items()}
+            logger.info(f"Fetched {len(item_names)} distinct item names from the name index.")
+            return item_names
+        finally:
+            name_index.close()
+
+    async def update_product_images(self, updates: List[Tuple[str, str]]) -> int:
+        """Bulk-update image URLs from (itemCode, imageUrl) pairs. Returns the number of rows changed."""
+        if not self.db.is_connected:
             logger.error("Database not connected. Call connect() first.")
-            return set()
+            return 0
         
         try:
-            query = "SELECT itemName FROM grocery WHERE itemName IS NOT NULL AND itemName != ''"
-            self.cursor.execute(query)
-            item_names = {row['itemName'] for row in self.cursor.fetchall()}
-            logger.info(f"Fetched {len(item_names)} distinct item names from the database.")
-            return item_names
+            updated_rows = await self.db.bulk_update_image_urls(updates)
+            logger.info(f"Updated image URLs for {updated_rows} products.")
+            return updated_rows
         except mysql.connector.Error as err:
-            logger.error(f"Error fetching all item names: {err}")
-            return set()
+            logger.error(f"Error bulk-updating product images: {err}")
+            return 0
 
     async def update_product_image(self, item_name: str, image_url: str) -> bool:
-        """Update image URL for a specific product."""
-        if not self.cursor:
+        """Update image URL for a specific product (prefer update_product_images when itemCodes are known)."""
+        if not self.db.is_connected:
             logger.error("Database not connected. Call connect() first.")
             return False
         
         try:
             query = "UPDATE grocery SET imageUrl = %s WHERE itemName = %s"
-            self.cursor.execute(query, (image_url, item_name))
-            self.connection.commit()
+            updated_rows = await self.db.execute(query, (image_url, item_name))
             
-            if self.cursor.rowcount > 0:
+            if updated_rows > 0:
                 logger.info(f"Updated image URL for '{item_name}' to '{image_url}'.")
                 return True
             else:
@@ -206,11 +372,234 @@ def is_search_term_covered(search_term: str, existing_products: Dict[str, str])
     return False
 
 
+def is_item_found(item_name: str, page_products: Optional[Dict[str, str]]) -> bool:
+    """
+    Whether a search found the searched item itself, not just other products: a barcode
+    hit (returned under item_name) or a page product matching the name exactly, after
+    normalization or as a confident fuzzy match.
+    """
+    return bool(page_products) and find_name_match(item_name, page_products) is not None
+
+
+def is_valid_image_url(url: str) -> bool:
+    """Validate if image URL is a real product image (not placeholder)."""
+    if not url:
+        return False
+    
+    # Check for known placeholder URLs
+    if url == PLACEHOLDER_IMAGE_URL:
+        logger.debug(f"Filtered out placeholder image: {url}")
+        return False
+    
+    # Check for placeholder patterns
+    url_lower = url.lower()
+    for pattern in PLACEHOLDER_PATTERNS:
+        if pattern in url_lower:
+            logger.debug(f"Filtered out placeholder image by pattern '{pattern}': {url}")
+            return False
+    
+    # Validate Cloudinary host (Shufersal uses Cloudinary)
+    if VALID_IMAGE_HOST not in url:
+        logger.debug(f"Filtered out image from non-approved host: {url}")
+        return False
+    
+    # Check for product image path
+    if VALID_IMAGE_PATH_CONTAINS not in url:
+        logger.debug(f"Filtered out image not in product path: {url}")
+        return False
+    
+    return True
+
+
+def is_valid_barcode(code: str) -> bool:
+    """Check for an EAN-13 barcode (13 digits with a valid check digit)."""
+    if not code or not code.isdigit() or len(code) != 13:
+        return False
+    checksum = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(code[:12]))
+    return (10 - checksum % 10) % 10 == int(code[12])
+
+
+def extract_tiles(html: str, page_url: str) -> Optional[List[Tuple[Optional[str], str, str]]]:
+    """
+    Extract every product tile of a results HTML page as (barcode, name, imageUrl) tuples,
+    without validating the images. Returns None when the page has no product grid
+    (not server-rendered or blocked).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if not soup.select_one(PRODUCT_GRID_SELECTOR):
+        return None
+
+    tiles = []
+    for item_element in soup.select(PRODUCT_ITEM_SELECTOR):
+        product_name = (item_element.get("data-product-name") or "").strip()
+        if not product_name:
+            continue
+
+        image_element = item_element.select_one(PRODUCT_IMAGE_SELECTOR)
+        image_url_relative = image_element.get("src") if image_element else None
+        if not image_url_relative:
+            continue
+
+        code_match = PRODUCT_CODE_PATTERN.search(item_element.get("data-product-code") or "")
+        tiles.append((code_match.group(1) if code_match else None, product_name, urljoin(page_url, image_url_relative)))
+
+    return tiles
+
+
+def parse_tiles(html: str, page_url: str, trace: Optional[SearchTrace] = None) -> Optional[List[Tuple[Optional[str], str, str]]]:
+    """
+    Parse product tiles from a results HTML page into (barcode, name, imageUrl) tuples,
+    keeping only valid images. Returns None when the page has no product grid
+    (not server-rendered or blocked).
+    """
+    with span(trace, "extraction"):
+        tiles = extract_tiles(html, page_url)
+    if tiles is None:
+        return None
+    with span(trace, "validation"):
+        return [tile for tile in tiles if is_valid_image_url(tile[2])]
+
+
+def parse_product_tiles(html: str, page_url: str, trace: Optional[SearchTrace] = None) -> Optional[Dict[str, str]]:
+    """
+    Parse product tiles from a search results HTML page into {name: imageUrl}.
+    Returns None when the page has no product grid (not server-rendered or blocked).
+    """
+    tiles = parse_tiles(html, page_url, trace)
+    if tiles is None:
+        return None
+
+    extracted_data = {}
+    for _, product_name, image_url in tiles:
+        extracted_data.setdefault(product_name, image_url)
+    return extracted_data
+
+
+class HttpSearchClient:
+    """Browserless Shufersal search client using a pooled aiohttp session."""
+
+    def __init__(self, max_connections: int = HTTP_MAX_CONNECTIONS, timeout: int = HTTP_TIMEOUT_SECONDS):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+        self.enabled = True
+        self.unparseable_streak = 0
+
+    async def open(self):
+        """Create the shared HTTP session."""
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml",
+                "Accept-Language": "he-IL,he;q=0.9,en;q=0.8"
+            }
+        )
+        logger.info(f"✅ HTTP search client ready ({self.max_connections} pooled connections).")
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def fetch_page(self, url: str, trace: Optional[SearchTrace] = None) -> Optional[Tuple[str, str]]:
+        """
+        GET a page through the host's rate limiter and return (html, final URL), or None on
+        errors, non-200 responses and block pages. The time (including any wait for the
+        limiter) is traced as navigation.
+        """
+        with span(trace, "navigation"):
+            return await self._fetch_page(url, trace)
+
+    async def _fetch_page(self, url: str, trace: Optional[SearchTrace]) -> Optional[Tuple[str, str]]:
+        async with limiter_for_url(url).permit() as permit:
+            try:
+                async with self.session.get(url) as response:
+                    if response.status != 200:
+                        logger.debug(f"HTTP GET {url} returned status {response.status}")
+                        permit.report(outcome_for_status(response.status),
+                                      parse_retry_after(response.headers.get("Retry-After")))
+                        return None
+                    html = await response.text()
+            except asyncio.TimeoutError:
+                logger.debug(f"HTTP GET {url} timed out")
+                permit.report(rate_limiter.TIMEOUT)
+                mark_timeout(trace)
+                return None
+            except aiohttp.ClientError as e:
+                logger.debug(f"HTTP GET {url} failed: {e}")
+                permit.report(rate_limiter.ERROR)
+                return None
+            if looks_blocked(html):
+                logger.debug(f"HTTP GET {url} returned a block page")
+                permit.report(rate_limiter.BLOCKED)
+                return None
+            return html, str(response.url)
+
+    async def search_barcode(self, barcode: str, trace: Optional[SearchTrace] = None) -> Optional[Tuple[str, str]]:
+        """
+        Search by barcode and return (name, imageUrl) of the tile whose product code is
+        exactly that barcode, or None when there is no such tile (or the request failed).
+        """
+        if not self.enabled or not self.session:
+            return None
+
+        page = await self.fetch_page(SEARCH_URL_TEMPLATE.format(query=barcode), trace)
+        if page is None:
+            return None
+        for tile_barcode, product_name, image_url in parse_tiles(*page, trace) or []:
+            if tile_barcode == barcode:
+                return product_name, image_url
+        return None
+
+    async def search(self, product_name: str, trace: Optional[SearchTrace] = None) -> Optional[Dict[str, str]]:
+        """
+        Search for a product and return {name: imageUrl} for the result tiles.
+        Returns None when the caller should fall back to the browser.
+        """
+        if not self.enabled or not self.session:
+            return None
+
+        page = await self.fetch_page(SEARCH_URL_TEMPLATE.format(query=quote_plus(product_name)), trace)
+        if page is None:
+            return None
+        html, page_url = page
+
+        products = parse_product_tiles(html, page_url, trace)
+        if products is None:
+            self.unparseable_streak += 1
+            if self.unparseable_streak >= HTTP_MAX_UNPARSEABLE:
+                self.enabled = False
+                logger.warning(f"⚠️  {self.unparseable_streak} HTTP responses in a row had no product grid. Using the browser only.")
+            return None
+
+        self.unparseable_streak = 0
+        return products
+
+
 class SupermarketScraper:
     """Handles Playwright automation for Shufersal website scraping."""
     
-    def __init__(self, headless: bool = True):
+    def __init__(self, headless: bool = True, direct_search: bool = True,
+                 http_client: Optional[HttpSearchClient] = None,
+                 fallback_browsers: Optional["FallbackBrowserPool"] = None,
+                 profile_slot: Optional[int] = None,
+                 metrics: Optional[SearchMetrics] = None,
+                 worker_id: Optional[int] = None):
         self.headless = headless
+        self.direct_search = direct_search
+        self.http_client = http_client
+        self.fallback_browsers = fallback_browsers  # Shared browsers for searches HTTP can't answer
+        self.profile_slot = profile_slot
+        self.barcode_hits = 0
+        self.searches_on_page = 0
+        self.page_crashed = False
+        self.recycle_counts = {'page': 0, 'memory': 0, 'crash': 0}
+        self.metrics = metrics  # Every find_products() call is traced when set
+        self.worker_id = worker_id
         self.playwright = None
         self.browser = None
         self.context = None
@@ -218,52 +607,127 @@ class SupermarketScraper:
 
     def _is_valid_image_url(self, url: str) -> bool:
         """Validate if image URL is a real product image (not placeholder)."""
-        if not url:
-            return False
-        
-        # Check for known placeholder URLs
-        if url == PLACEHOLDER_IMAGE_URL:
-            logger.debug(f"Filtered out placeholder image: {url}")
-            return False
-        
-        # Check for placeholder patterns
-        url_lower = url.lower()
-        for pattern in PLACEHOLDER_PATTERNS:
-            if pattern in url_lower:
-                logger.debug(f"Filtered out placeholder image by pattern '{pattern}': {url}")
-                return False
-        
-        # Validate Cloudinary host (Shufersal uses Cloudinary)
-        if VALID_IMAGE_HOST not in url:
-            logger.debug(f"Filtered out image from non-approved host: {url}")
-            return False
-        
-        # Check for product image path
-        if VALID_IMAGE_PATH_CONTAINS not in url:
-            logger.debug(f"Filtered out image not in product path: {url}")
-            return False
-        
-        return True
+        return is_valid_image_url(url)
 
     async def setup_playwright(self):
-        """Initialize Playwright browser and page."""
+        """
+        Initialize Playwright browser and page.
+        With a profile slot, the browser runs on a persistent profile (cookies, consent state
+        and the disk HTTP cache survive between runs); otherwise a fresh context is used.
+        Both are seeded with the cookies saved in STORAGE_STATE_FILE.
+        """
         try:
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=self.headless)
-            self.context = await self.browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                viewport={'width': 1920, 'height': 1080}
-            )
-            self.page = await self.context.new_page()
+            if PERSISTENT_PROFILES and self.profile_slot is not None:
+                profile_dir = os.path.join(PROFILE_ROOT_DIR, f"slot-{self.profile_slot}")
+                try:
+                    self.context = await self.playwright.chromium.launch_persistent_context(
+                        profile_dir,
+                        headless=self.headless,
+                        user_agent=USER_AGENT,
+                        viewport={'width': 1920, 'height': 1080}
+                    )
+                    storage_state = self._load_storage_state()
+                    if storage_state and storage_state.get('cookies'):
+                        await self.context.add_cookies(storage_state['cookies'])
+                except Exception as e:
+                    # Most likely the profile is in use by another process
+                    logger.warning(f"⚠️  Could not open browser profile {profile_dir} ({e}); using a fresh context.")
+                    self.context = None
+
+            if not self.context:
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+                self.context = await self.browser.new_context(
+                    user_agent=USER_AGENT,
+                    viewport={'width': 1920, 'height': 1080},
+                    storage_state=self._load_storage_state()
+                )
+            self._attach_page(self.context.pages[0] if self.context.pages else await self.context.new_page())
             logger.info("✅ Playwright setup complete.")
         except Exception as e:
             logger.error(f"❌ Error setting up Playwright: {e}")
+            await self._close_browser()  # Don't leave a half-started Playwright behind
             raise
 
-    async def close_playwright(self):
-        """Close Playwright browser and cleanup."""
+    def _load_storage_state(self) -> Optional[Dict]:
+        try:
+            with open(STORAGE_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    async def _save_storage_state(self):
+        """Write the context's cookies and local storage for the next browsers (atomic, last writer wins)."""
+        try:
+            state = await self.context.storage_state()
+            temp_filename = f"{STORAGE_STATE_FILE}.{id(self)}.tmp"
+            with open(temp_filename, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(temp_filename, STORAGE_STATE_FILE)
+        except Exception as e:
+            logger.debug(f"Could not save browser storage state: {e}")
+
+    def _attach_page(self, page: Page):
+        """Make page the search page and watch it for renderer crashes."""
+        self.page = page
+        self.page_crashed = False
+        self.searches_on_page = 0
+        page.on("crash", self._on_page_crash)
+
+    def _on_page_crash(self, page: Page):
+        if page is self.page:
+            logger.warning("💥 Browser page crashed; it will be restarted before the next search.")
+            self.page_crashed = True
+
+    async def _page_heap_mb(self) -> Optional[float]:
+        """JS heap of the search page in MB (Chrome DevTools Performance metrics), or None if unavailable."""
+        try:
+            cdp = await self.context.new_cdp_session(self.page)
+            try:
+                await cdp.send("Performance.enable")
+                metrics = await cdp.send("Performance.getMetrics")
+            finally:
+                await cdp.detach()
+        except Exception as e:
+            logger.debug(f"Could not read page metrics: {e}")
+            return None
+        values = {metric['name']: metric['value'] for metric in metrics.get('metrics', [])}
+        heap = values.get('JSHeapTotalSize')
+        return heap / (1024 * 1024) if heap is not None else None
+
+    async def _restart_browser(self, reason: str):
+        """Close and relaunch the browser, keeping the browser slot (and its profile)."""
+        logger.info(f"♻️  Restarting browser ({reason})")
+        self.recycle_counts[reason] += 1
+        await self._close_browser()
+        await self.setup_playwright()
+
+    async def _recycle_if_needed(self):
+        """Replace a crashed, worn or memory-heavy page before the next search."""
+        if self.page_crashed:
+            await self._restart_browser('crash')
+            return
+
+        if self.searches_on_page and self.searches_on_page % MEMORY_CHECK_EVERY == 0:
+            heap_mb = await self._page_heap_mb()
+            if heap_mb is not None and heap_mb > PAGE_HEAP_LIMIT_MB:
+                logger.info(f"🧠 Page heap at {heap_mb:.0f}MB (limit {PAGE_HEAP_LIMIT_MB}MB)")
+                await self._restart_browser('memory')
+                return
+
+        if self.searches_on_page >= RECYCLE_PAGE_EVERY:
+            old_page = self.page
+            self._attach_page(await self.context.new_page())
+            self.recycle_counts['page'] += 1
+            try:
+                await old_page.close()
+            except Exception as e:
+                logger.debug(f"Error closing recycled page: {e}")
+
+    async def _close_browser(self):
         try:
             if self.context:
+                await self._save_storage_state()
                 await self.context.close()
             if self.browser:
                 await self.browser.close()
@@ -272,36 +736,104 @@ class SupermarketScraper:
             logger.info("✅ Playwright closed.")
         except Exception as e:
             logger.error(f"❌ Error closing Playwright: {e}")
+        finally:
+            self.context = self.browser = self.playwright = self.page = None
 
-    async def search_product(self, product_name: str) -> bool:
+    async def close_playwright(self):
+        """Close Playwright browser and cleanup."""
+        await self._close_browser()
+
+    async def search_product(self, product_name: str, trace: Optional[SearchTrace] = None) -> bool:
         """Search for a product on Shufersal website."""
         if not self.page:
-            logger.error("Page not initialized. Call setup_playwright() first.")
-            return False
+            # Never set up, or a crash/memory restart failed to relaunch: try again for this search
+            try:
+                await self.setup_playwright()
+            except Exception as e:
+                logger.error(f"❌ No browser page for '{product_name}': {e}")
+                return False
+
+        for attempt in range(2):
+            try:
+                await self._recycle_if_needed()
+                self.searches_on_page += 1
+                return await self._run_search(product_name, trace)
+            except Exception as e:
+                if attempt == 0 and (self.page_crashed or any(m in str(e) for m in TARGET_CLOSED_MARKERS)):
+                    # The page or browser died under us: restart it and retry the search once
+                    logger.warning(f"💥 Browser target lost while searching for '{product_name}'; restarting.")
+                    self.page_crashed = True
+                    continue
+                logger.error(f"❌ Error during search for '{product_name}': {e}")
+                return False
+        return False
+
+    async def _run_search(self, product_name: str, trace: Optional[SearchTrace] = None) -> bool:
+        # The permit covers the whole page load, so the host's limiter sees browser searches too
+        url = SEARCH_URL_TEMPLATE.format(query=quote_plus(product_name)) if self.direct_search else BASE_URL
+        started = time.monotonic()  # Navigation time includes the wait for the limiter
+        async with limiter_for_url(url).permit() as permit:
+            try:
+                # Direct search opens the results page straight from the query string (single page load)
+                response = await self.page.goto(url, timeout=NAVIGATION_TIMEOUT_MS, wait_until="domcontentloaded")
+            except PlaywrightTimeoutError:
+                logger.warning(f"⏰ Navigation timed out while searching for '{product_name}'.")
+                permit.report(rate_limiter.TIMEOUT)
+                mark_timeout(trace)
+                return False
+            finally:
+                if trace:
+                    trace.add("navigation", time.monotonic() - started)
+            if response is not None and outcome_for_status(response.status) != rate_limiter.OK:
+                logger.warning(f"🚫 Search page for '{product_name}' returned status {response.status}.")
+                permit.report(outcome_for_status(response.status),
+                              parse_retry_after(await response.header_value("retry-after")))
+                return False
+
+            try:
+                with span(trace, "grid_wait"):
+                    if not self.direct_search:
+                        # Type the query into the homepage search box
+                        search_input = self.page.locator(SEARCH_INPUT_SELECTOR)
+                        await search_input.wait_for(state="visible", timeout=GRID_TIMEOUT_MS)
+                        await search_input.fill(product_name)
+                        await search_input.press("Enter")
+
+                    # Wait for search results to load
+                    await self.page.wait_for_selector(PRODUCT_GRID_SELECTOR, timeout=GRID_TIMEOUT_MS, state="visible")
+                    await self._wait_for_tiles_ready()
+                return True
 
+            except PlaywrightTimeoutError:
+                # No grid: either a search without results, or a bot wall
+                mark_timeout(trace)
+                if looks_blocked(await self.page.content()):
+                    logger.warning(f"🚫 Block page while searching for '{product_name}'.")
+                    permit.report(rate_limiter.BLOCKED)
+                else:
+                    logger.warning(f"⏰ Timeout while searching for '{product_name}'.")
+                    permit.report(rate_limiter.MISS)
+                return False
+
+    async def _wait_for_tiles_ready(self):
+        """Wait until every rendered product tile has its image src populated."""
         try:
-            # Navigate to homepage
-            await self.page.goto(BASE_URL, timeout=60000, wait_until="domcontentloaded")
-
-            # Wait for and fill search input
-            search_input = self.page.locator(SEARCH_INPUT_SELECTOR)
-            await search_input.wait_for(state="visible", timeout=30000)
-            await search_input.fill(product_name)
-            await search_input.press("Enter")
-
-            # Wait for search results to load
-            await self.page.wait_for_selector(PRODUCT_GRID_SELECTOR, timeout=30000, state="visible")
-            await self.page.wait_for_load_state("networkidle", timeout=15000)
-            return True
-            
+            await self.page.wait_for_function(
+                """([itemSelector, imageSelector]) => {
+                    const tiles = document.querySelectorAll(itemSelector);
+                    return Array.from(tiles).every(tile => {
+                        const img = tile.querySelector(imageSelector);
+                        return !img || !!img.getAttribute('src');
+                    });
+                }""",
+                arg=[PRODUCT_ITEM_SELECTOR, PRODUCT_IMAGE_SELECTOR],
+                timeout=TILES_READY_TIMEOUT_MS
+            )
         except PlaywrightTimeoutError:
-            logger.warning(f"⏰ Timeout while searching for '{product_name}'.")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Error during search for '{product_name}': {e}")
-            return False
+            # Grid is visible - extract whatever has loaded instead of failing the search
+            logger.debug("Some product tiles did not populate their images in time.")
 
-    async def extract_products_from_results(self) -> Dict[str, str]:
+    async def extract_products_from_results(self, trace: Optional[SearchTrace] = None) -> Dict[str, str]:
         """Extract all products from current search results page."""
         if not self.page:
             logger.error("Page not initialized.")
@@ -309,56 +841,101 @@ class SupermarketScraper:
 
         extracted_data = {}
         try:
-            # Get all product items
-            product_elements = await self.page.locator(PRODUCT_ITEM_SELECTOR).all()
-
-            if not product_elements:
-                return {}
-
-            for item_element in product_elements:
-                try:
-                    # Extract product name from data-product-name attribute
-                    product_name = await item_element.get_attribute("data-product-name")
-                    if not product_name:
+            candidates = []
+            with span(trace, "extraction"):
+                # Get all product items
+                product_elements = await self.page.locator(PRODUCT_ITEM_SELECTOR).all()
+
+                for item_element in product_elements:
+                    try:
+                        # Extract product name from data-product-name attribute
+                        product_name = await item_element.get_attribute("data-product-name")
+                        if not product_name:
+                            continue
+
+                        # Extract image URL
+                        image_element = item_element.locator(PRODUCT_IMAGE_SELECTOR)
+                        image_url_relative = await image_element.get_attribute("src")
+
+                        if image_url_relative:
+                            # Convert to absolute URL
+                            candidates.append((product_name.strip(), urljoin(self.page.url, image_url_relative)))
+
+                    except Exception as e:
+                        logger.error(f"Error processing a product item: {e}")
                         continue
-                    
-                    product_name = product_name.strip()
-
-                    # Extract image URL
-                    image_element = item_element.locator(PRODUCT_IMAGE_SELECTOR)
-                    image_url_relative = await image_element.get_attribute("src")
-
-                    if image_url_relative:
-                        # Convert to absolute URL
-                        image_url_absolute = urljoin(self.page.url, image_url_relative)
-                        
-                        if self._is_valid_image_url(image_url_absolute):
-                            if product_name not in extracted_data:
-                                extracted_data[product_name] = image_url_absolute
-                            else:
-                                logger.debug(f"Duplicate product name '{product_name}' found on page, keeping first image.")
+
+            with span(trace, "validation"):
+                for product_name, image_url_absolute in candidates:
+                    if self._is_valid_image_url(image_url_absolute):
+                        if product_name not in extracted_data:
+                            extracted_data[product_name] = image_url_absolute
                         else:
-                            logger.debug(f"Invalid or placeholder image URL for '{product_name}': {image_url_absolute}")
+                            logger.debug(f"Duplicate product name '{product_name}' found on page, keeping first image.")
+                    else:
+                        logger.debug(f"Invalid or placeholder image URL for '{product_name}': {image_url_absolute}")
 
-                except Exception as e:
-                    logger.error(f"Error processing a product item: {e}")
-                    continue
-            
             return extracted_data
 
         except Exception as e:
             logger.error(f"Error extracting products from results: {e}")
             return {}
 
+    async def find_products(self, item_name: str, item_code: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """
+        Search for an item and return the products on its results page.
+        Items with a valid barcode are looked up by barcode first; an exact hit returns
+        {item_name: imageUrl} so it maps straight back to the grocery row.
+        Name search tries the HTTP client first and falls back to Playwright. Returns None if the search failed.
+        With metrics, the search's stage timings are recorded.
+        """
+        if not self.metrics:
+            return await self._find_products(item_name, item_code, None)
+        trace = self.metrics.start(self.worker_id, item_name)
+        products = await self._find_products(item_name, item_code, trace)
+        self.metrics.finish(trace, products, found=is_item_found(item_name, products))
+        return products
+
+    async def _find_products(self, item_name: str, item_code: Optional[str],
+                             trace: Optional[SearchTrace]) -> Optional[Dict[str, str]]:
+        if self.http_client and item_code and is_valid_barcode(item_code):
+            barcode_hit = await self.http_client.search_barcode(item_code, trace)
+            if barcode_hit:
+                self.barcode_hits += 1
+                if trace:
+                    trace.source = "barcode"
+                return {item_name: barcode_hit[1]}
+
+        if self.http_client:
+            products = await self.http_client.search(item_name, trace)
+            if products is not None:
+                if trace:
+                    trace.source = "http"
+                return products
+
+        if trace:
+            trace.source = "browser"
+        if self.fallback_browsers:
+            # Waits for a free browser rather than dropping the item while HTTP is failing
+            return await self.fallback_browsers.search(item_name, trace)
+
+        if not self.page:
+            await self.setup_playwright()
+        if await self.search_product(item_name, trace):
+            return await self.extract_products_from_results(trace)
+        return None
+
     async def scrape_for_item_names_fast(self, item_names_to_search: List[str], 
                                        existing_data: Dict[str, str] = None,
-                                       save_interval: int = 100) -> Dict[str, str]:
+                                       save_interval: int = 100,
+                                       checkpoint: Optional[CheckpointStore] = None,
+                                       negative_cache: Optional[NegativeSearchCache] = None) -> Dict[str, str]:
         """
-        Fast scraping for thousands of items with progress saving and smart duplicate avoidance.
+        Fast scraping for thousands of items with checkpointing and smart duplicate avoidance.
         """
         global scraped_data_global
         
-        if not self.page:
+        if not self.page and not self.http_client:
             await self.setup_playwright()
 
         all_found_products = existing_data or {}
@@ -377,12 +954,17 @@ class SupermarketScraper:
                 
             logger.info(f"🔍 [{processed_count + 1}/{total_items}] Searching: '{item_name}'")
             
-            if await self.search_product(item_name):
-                # Short delay for page to fully load
-                await asyncio.sleep(0.3)
-                
-                page_products = await self.extract_products_from_results()
-                
+            page_products = await self.find_products(item_name)
+            if page_products is not None:
+                if checkpoint:
+                    checkpoint.record_search(item_name, page_products)
+                if negative_cache:
+                    # Other products on the page don't make the item itself any less missing
+                    if is_item_found(item_name, page_products):
+                        negative_cache.record_hit(item_name)
+                    else:
+                        negative_cache.record_miss(item_name)
+
                 # Add new products (avoid duplicates)
                 new_count = 0
                 for name, url in page_products.items():
@@ -400,51 +982,70 @@ class SupermarketScraper:
             
             processed_count += 1
             
-            # Save progress periodically
+            # Report progress periodically (every search is already checkpointed)
             if processed_count % save_interval == 0:
-                await save_to_json(all_found_products, PROGRESS_JSON_FILE)
-                logger.info(f"💾 Progress saved: {len(all_found_products)} total products after {processed_count} searches")
-            
-            # Small delay to be respectful to the website
-            await asyncio.sleep(0.2)
+                logger.info(f"💾 Progress: {len(all_found_products)} total products after {processed_count} searches")
 
         logger.info(f"🎉 Fast scraping completed! Processed {processed_count} searches, found {new_products_count} new products")
         return all_found_products
 
-    async def scrape_batch(self, items_batch: List[str], browser_id: int, existing_data: Dict[str, str] = None, 
-                         progress_callback=None, save_interval: int = 50) -> Dict[str, str]:
+    async def scrape_queue(self, items_queue: asyncio.Queue, browser_id: int, existing_data: Dict[str, str] = None, 
+                           save_interval: int = 50,
+                           checkpoint: Optional[CheckpointStore] = None,
+                           negative_cache: Optional[NegativeSearchCache] = None,
+                           products_callback=None,
+                           result_store: Optional["ResultStore"] = None) -> int:
         """
-        Scrape a batch of items for parallel processing with periodic saving.
+        Scrape items pulled from a shared queue (until a None sentinel) for parallel processing,
+        checkpointing every completed search. Queue entries are item names or (itemCode, itemName)
+        pairs; pairs with a valid barcode are resolved by barcode first. products_callback, when given, is awaited with
+        the products of every successful search (used to stream them into the database).
+        Products are added to result_store (shared by all browsers), which also records the
+        names whose search completed; returns how many new products this browser found.
         """
-        if not self.page:
+        if not self.page and not self.http_client:
             await self.setup_playwright()
 
-        batch_results = {}
-        batch_size = len(items_batch)
+        if result_store is None:
+            result_store = ResultStore()
+        browser_new_count = 0
         processed_count = 0
+        index = 0
         
-        logger.info(f"🤖 Browser {browser_id}: Starting batch of {batch_size} items")
+        logger.info(f"🤖 Browser {browser_id}: Waiting for items from the queue")
         
-        for index, item_name in enumerate(items_batch, 1):
-            # Smart duplicate avoidance
-            if existing_data and is_search_term_covered(item_name, existing_data):
+        while True:
+            entry = await items_queue.get()
+            if entry is None:
+                break
+            item_code, item_name = entry if isinstance(entry, tuple) else (None, entry)
+            index += 1
+
+            # Smart duplicate avoidance (a barcode lookup is exact, so only skip exact names)
+            if existing_data and (item_name in existing_data if is_valid_barcode(item_code)
+                                  else is_search_term_covered(item_name, existing_data)):
                 logger.debug(f"🤖 Browser {browser_id}: Skipping '{item_name}' - likely already covered")
                 continue
                 
-            logger.info(f"🤖 Browser {browser_id}: [{index}/{batch_size}] Searching: '{item_name}'")
+            logger.info(f"🤖 Browser {browser_id}: [{index}] Searching: '{item_name}'")
             
-            if await self.search_product(item_name):
-                # Reduced delay for parallel processing
-                await asyncio.sleep(0.2)
-                
-                page_products = await self.extract_products_from_results()
-                
-                # Add new products
-                new_count = 0
-                for name, url in page_products.items():
-                    if name not in batch_results:
-                        batch_results[name] = url
-                        new_count += 1
+            page_products = await self.find_products(item_name, item_code)
+            if page_products is not None:
+                if checkpoint:
+                    checkpoint.record_search(item_name, page_products)
+                if negative_cache:
+                    # Other products on the page don't make the item itself any less missing
+                    if is_item_found(item_name, page_products):
+                        negative_cache.record_hit(item_name)
+                    else:
+                        negative_cache.record_miss(item_name)
+                if products_callback and page_products:
+                    await products_callback(page_products)
+                result_store.searched.add(item_name)
+
+                # Add new products (only the delta is merged)
+                new_count = result_store.add(page_products)
+                browser_new_count += new_count
                 
                 if new_count > 0:
                     logger.info(f"🤖 Browser {browser_id}: ✅ Found {new_count} new products")
@@ -455,158 +1056,271 @@ class SupermarketScraper:
             
             processed_count += 1
             
-            # Periodic saving for this browser
+            # Periodic progress report for this browser
             if processed_count % save_interval == 0:
-                browser_filename = f"browser_{browser_id}_progress.json"
-                await save_to_json(batch_results, browser_filename)
-                logger.info(f"🤖 Browser {browser_id}: 💾 Progress saved ({len(batch_results)} products)")
-                
-                # Notify main thread for combined progress saving
-                if progress_callback:
-                    await progress_callback(browser_id, batch_results)
-            
-            # Respectful delay between searches
-            await asyncio.sleep(0.5)  # Slightly longer delay for parallel processing
+                logger.info(f"🤖 Browser {browser_id}: 💾 Progress: {browser_new_count} new products")
 
-        logger.info(f"🤖 Browser {browser_id}: ✅ Batch completed! Found {len(batch_results)} products")
-        
-        # Final save for this browser
-        browser_filename = f"browser_{browser_id}_final.json"
-        await save_to_json(batch_results, browser_filename)
-        
-        return batch_results
+        logger.info(f"🤖 Browser {browser_id}: ✅ Queue drained! Found {browser_new_count} new products")
+        return browser_new_count
 
 
-async def scrape_parallel(item_names_to_search: List[str], 
-                         existing_data: Dict[str, str] = None, 
-                         num_browsers: int = 10,
-                         save_interval: int = 100) -> Dict[str, str]:
+class ResultStore:
     """
-    Parallel scraping with multiple browser instances and periodic progress saving.
+    Products found by all browsers of a run. Browsers push each page's products and only
+    the names not seen yet are merged, so a merge costs O(page) and the new-product count
+    is kept up to date instead of being recomputed from every browser's results.
     """
-    global scraped_data_global
-    
-    all_found_products = existing_data or {}
-    scraped_data_global = all_found_products
-    total_items = len(item_names_to_search)
-    
-    # Progress tracking for combined saves
-    browser_progress = {}
-    last_combined_save = 0
-    
-    async def progress_callback(browser_id: int, browser_results: Dict[str, str]):
-        """Called when a browser saves progress - combines and saves all progress."""
-        nonlocal last_combined_save
-        
-        browser_progress[browser_id] = browser_results
-        
-        # Combine all browser results
-        combined_progress = dict(all_found_products)
-        total_from_browsers = 0
-        
-        for browser_data in browser_progress.values():
-            for name, url in browser_data.items():
-                if name not in combined_progress:
-                    combined_progress[name] = url
-                    total_from_browsers += 1
-        
-        # Save combined progress every 500 total new products (50 per browser * 10)
-        if total_from_browsers - last_combined_save >= 500:
-            await save_to_json(combined_progress, PROGRESS_JSON_FILE)
-            scraped_data_global.update(combined_progress)  # Update global for signal handler
-            logger.info(f"💾 COMBINED progress saved: {len(combined_progress)} total products")
-            last_combined_save = total_from_browsers
-    
-    # Split items into batches for each browser
-    batch_size = len(item_names_to_search) // num_browsers
-    batches = []
-    
-    for i in range(num_browsers):
-        start_idx = i * batch_size
-        if i == num_browsers - 1:  # Last batch gets any remaining items
-            end_idx = len(item_names_to_search)
-        else:
-            end_idx = (i + 1) * batch_size
-        
-        batch = item_names_to_search[start_idx:end_idx]
-        if batch:  # Only add non-empty batches
-            batches.append(batch)
-    
-    logger.info(f"🚀 Starting PARALLEL scraping with {len(batches)} browsers")
-    logger.info(f"📊 Total items: {total_items}, Average per browser: {batch_size}")
-    logger.info(f"💾 Progress saving: Every 50 items per browser + combined every 500 total")
-    
-    # Create browser instances
-    scrapers = []
-    for i in range(len(batches)):
-        scraper = SupermarketScraper(headless=True)
-        scrapers.append(scraper)
-    
+
+    def __init__(self, initial: Optional[Dict[str, str]] = None, report_every: int = 500,
+                 searched: Optional[Set[str]] = None):
+        self.products: Dict[str, str] = dict(initial or {})
+        self.searched: Set[str] = searched if searched is not None else set()  # Names whose search completed
+        self.new_count = 0
+        self.report_every = report_every
+        self.next_report = report_every
+
+    def add(self, products: Dict[str, str]) -> int:
+        """Merge a page of products; returns how many were new."""
+        added = 0
+        for name, url in products.items():
+            if name not in self.products:
+                self.products[name] = url
+                added += 1
+        self.new_count += added
+        if self.new_count >= self.next_report:
+            logger.info(f"💾 COMBINED progress: {len(self.products)} total products ({self.new_count} new)")
+            self.next_report = self.new_count + self.report_every
+        return added
+
+
+class FallbackBrowserPool:
+    """
+    Playwright browsers shared by the HTTP workers for searches the HTTP client can't answer.
+
+    Up to size browsers are launched lazily, each on its own profile slot. A worker borrows
+    one for a single search and hands it back, so when HTTP fails for many items (or is
+    disabled) the workers queue for a browser instead of dropping their items - the run
+    slows down to the browser count but still covers the whole queue.
+    """
+
+    def __init__(self, size: int = MAX_FALLBACK_BROWSERS, headless: bool = True,
+                 wait_seconds: float = FALLBACK_BROWSER_WAIT_SECONDS):
+        self.size = size
+        self.headless = headless
+        self.wait_seconds = wait_seconds
+        self.browsers: List[SupermarketScraper] = []
+        self.idle: asyncio.Queue = asyncio.Queue()
+
+    async def _acquire(self) -> SupermarketScraper:
+        if self.idle.empty() and len(self.browsers) < self.size:
+            browser = SupermarketScraper(headless=self.headless, profile_slot=len(self.browsers))
+            self.browsers.append(browser)  # Before the await, so concurrent callers see the slot as taken
+            try:
+                await browser.setup_playwright()
+            except Exception:
+                self.browsers.remove(browser)
+                raise
+            return browser
+        return await asyncio.wait_for(self.idle.get(), timeout=self.wait_seconds)
+
+    async def search(self, item_name: str, trace: Optional[SearchTrace] = None) -> Optional[Dict[str, str]]:
+        """Search in a borrowed browser; returns None if the search failed or no browser became free."""
+        try:
+            browser = await self._acquire()
+        except asyncio.TimeoutError:
+            logger.warning(f"⏳ No fallback browser became free within {self.wait_seconds}s for '{item_name}'")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Could not launch a fallback browser: {e}")
+            return None
+        try:
+            if await browser.search_product(item_name, trace):
+                return await browser.extract_products_from_results(trace)
+            return None
+        finally:
+            self.idle.put_nowait(browser)
+
+    async def close(self):
+        await asyncio.gather(*(browser.close_playwright() for browser in self.browsers), return_exceptions=True)
+
+
+async def feed_scraping_queue(items: Union[List[QueueItem], AsyncIterable[List[QueueItem]]],
+                              items_queue: asyncio.Queue, num_workers: int) -> int:
+    """Push items (a list, or an async stream of batches) into the bounded queue, then one sentinel per worker."""
+    queued_count = 0
+    stream_error = None
     try:
-        # Setup all browsers in parallel
-        logger.info("⚡ Setting up browsers in parallel...")
-        setup_tasks = [scraper.setup_playwright() for scraper in scrapers]
-        await asyncio.gather(*setup_tasks)
-        
-        # Start parallel scraping with progress callback
-        logger.info("🔥 Starting parallel batch processing...")
-        scraping_tasks = []
-        for i, (scraper, batch) in enumerate(zip(scrapers, batches)):
-            task = scraper.scrape_batch(
-                batch, 
-                browser_id=i+1, 
-                existing_data=existing_data,
-                progress_callback=progress_callback,
-                save_interval=50
-            )
-            scraping_tasks.append(task)
-        
-        # Wait for all browsers to complete
-        batch_results = await asyncio.gather(*scraping_tasks, return_exceptions=True)
-        
-        # Combine final results from all browsers
-        combined_results = dict(all_found_products)
-        total_new_products = 0
-        
-        for i, result in enumerate(batch_results):
-            if isinstance(result, Exception):
-                logger.error(f"🤖 Browser {i+1} failed with error: {result}")
-                continue
-            
-            browser_new_count = 0
-            for name, url in result.items():
-                if name not in combined_results:
-                    combined_results[name] = url
-                    browser_new_count += 1
-                    total_new_products += 1
-            
-            logger.info(f"🤖 Browser {i+1}: Added {browser_new_count} unique products")
-        
-        # Update global for signal handler
-        scraped_data_global = combined_results
-        
-        logger.info(f"🎉 PARALLEL SCRAPING COMPLETED!")
-        logger.info(f"   📊 Total unique products: {len(combined_results)}")
-        logger.info(f"   ✨ New products found: {total_new_products}")
-        logger.info(f"   ⚡ Speed boost: ~{num_browsers}x faster than single browser")
-        
-        return combined_results
-        
+        if isinstance(items, list):
+            for item_name in items:
+                await items_queue.put(item_name)
+                queued_count += 1
+        else:
+            async for batch in items:
+                for item_name in batch:
+                    await items_queue.put(item_name)
+                    queued_count += 1
     except Exception as e:
-        logger.error(f"💥 Error in parallel scraping: {e}")
-        return all_found_products
-    finally:
+        stream_error = e
+
+    # Let the workers finish what was queued, then stop
+    for _ in range(num_workers):
+        await items_queue.put(None)
+    if stream_error:
+        raise stream_error
+    return queued_count
+
+
+class ScraperCrew:
+    """
+    The scrapers of a parallel run and, with an http_client, the fallback browsers they
+    share. A crew stays open across runs, so a worker that scrapes batch after batch
+    (main_worker) launches its browsers once instead of once per batch.
+    """
+
+    def __init__(self, num_browsers: int = 10, http_client: Optional[HttpSearchClient] = None,
+                 metrics: Optional[SearchMetrics] = None):
+        self.http_client = http_client
+        # HTTP workers share a small pool of lazily launched fallback browsers
+        self.fallback_browsers = FallbackBrowserPool(MAX_FALLBACK_BROWSERS) if http_client else None
+        self.scrapers = [
+            SupermarketScraper(headless=True, http_client=http_client, fallback_browsers=self.fallback_browsers,
+                               profile_slot=None if http_client else i, metrics=metrics, worker_id=i + 1)
+            for i in range(num_browsers)
+        ]
+        self.started = False
+
+    async def start(self):
+        if not self.http_client and not self.started:
+            # Setup all browsers in parallel
+            logger.info("⚡ Setting up browsers in parallel...")
+            await asyncio.gather(*(scraper.setup_playwright() for scraper in self.scrapers))
+        self.started = True
+
+    async def run(self, item_names_to_search: Union[List[QueueItem], AsyncIterable[List[QueueItem]]],
+                  existing_data: Dict[str, str] = None,
+                  checkpoint: Optional[CheckpointStore] = None,
+                  negative_cache: Optional[NegativeSearchCache] = None,
+                  products_callback=None,
+                  searched: Optional[Set[str]] = None) -> Dict[str, str]:
+        """Scrape one list or stream of items with every scraper of the crew (see scrape_parallel)."""
+        global scraped_data_global
+        scrapers = self.scrapers
+
+        # Every browser merges its finds into one shared store (the signal handler saves it as-is)
+        result_store = ResultStore(existing_data, searched=searched)
+        scraped_data_global = result_store.products
+
+        items_queue = asyncio.Queue(maxsize=len(scrapers) * QUEUE_BATCHES_PER_WORKER)
+
+        logger.info(f"🚀 Starting PARALLEL scraping with {len(scrapers)} workers")
+        if checkpoint:
+            logger.info(f"💾 Checkpointing every completed search to {checkpoint.filename}")
+
+        feeder_task = None
+        try:
+            await self.start()
+            # Stream items into the queue while the workers pull from it
+            feeder_task = asyncio.create_task(feed_scraping_queue(item_names_to_search, items_queue, len(scrapers)))
+
+            # Start parallel scraping into the shared result store
+            logger.info("🔥 Starting parallel queue processing...")
+            scraping_tasks = []
+            for i, scraper in enumerate(scrapers):
+                task = scraper.scrape_queue(
+                    items_queue,
+                    browser_id=i+1,
+                    existing_data=existing_data,
+                    save_interval=50,
+                    checkpoint=checkpoint,
+                    negative_cache=negative_cache,
+                    products_callback=products_callback,
+                    result_store=result_store
+                )
+                scraping_tasks.append(task)
+
+            # Wait for all browsers to complete
+            batch_results = await asyncio.gather(*scraping_tasks, return_exceptions=True)
+            if not feeder_task.done():
+                # Every worker stopped early - nothing is draining the queue anymore
+                feeder_task.cancel()
+            try:
+                queued_count = await feeder_task
+                logger.info(f"📊 Total items streamed to workers: {queued_count}")
+            except asyncio.CancelledError:
+                logger.warning("⚠️  Workers stopped before the item stream was exhausted.")
+            except Exception as e:
+                logger.error(f"💥 Item stream failed before completion: {e}")
+
+            # Results were merged as they arrived; just report per browser
+            for i, result in enumerate(batch_results):
+                if isinstance(result, Exception):
+                    logger.error(f"🤖 Browser {i+1} failed with error: {result}")
+                else:
+                    logger.info(f"🤖 Browser {i+1}: Added {result} unique products")
+
+            logger.info(f"🎉 PARALLEL SCRAPING COMPLETED!")
+            logger.info(f"   📊 Total unique products: {len(result_store.products)}")
+            logger.info(f"   ✨ New products found: {result_store.new_count}")
+            logger.info(f"   🏷️  Exact barcode hits (crew total): {sum(scraper.barcode_hits for scraper in scrapers)}")
+            browsers = scrapers + (self.fallback_browsers.browsers if self.fallback_browsers else [])
+            recycles = {reason: sum(browser.recycle_counts[reason] for browser in browsers) for reason in ('page', 'memory', 'crash')}
+            logger.info(f"   ♻️  Browser recycles (crew total): {recycles['page']} pages, {recycles['memory']} memory restarts, {recycles['crash']} crash restarts")
+            for host, stats in limiter_stats().items():
+                logger.info(f"   🚦 {host}: settled at {stats['rate']} req/s, {stats['concurrency']} in flight | {stats}")
+
+            return result_store.products
+
+        except Exception as e:
+            logger.error(f"💥 Error in parallel scraping: {e}")
+            return result_store.products
+        finally:
+            if feeder_task and not feeder_task.done():
+                feeder_task.cancel()
+
+    async def close(self):
         # Clean up all browsers
         logger.info("🧹 Cleaning up browsers...")
-        cleanup_tasks = [scraper.close_playwright() for scraper in scrapers]
+        cleanup_tasks = [scraper.close_playwright() for scraper in self.scrapers]
+        if self.fallback_browsers:
+            cleanup_tasks.append(self.fallback_browsers.close())
         await asyncio.gather(*cleanup_tasks, return_exceptions=True)
 
 
-async def save_to_json(data: Dict[str, str], filename: str = JSON_OUTPUT_FILE):
-    """Save scraped data to JSON file."""
+async def scrape_parallel(item_names_to_search: Union[List[QueueItem], AsyncIterable[List[QueueItem]]], 
+                         existing_data: Dict[str, str] = None, 
+                         num_browsers: int = 10,
+                         save_interval: int = 100,
+                         http_client: Optional[HttpSearchClient] = None,
+                         checkpoint: Optional[CheckpointStore] = None,
+                         negative_cache: Optional[NegativeSearchCache] = None,
+                         products_callback=None,
+                         metrics: Optional[SearchMetrics] = None,
+                         searched: Optional[Set[str]] = None) -> Dict[str, str]:
+    """
+    Parallel scraping with multiple browser instances; every completed search is checkpointed
+    (and, with metrics, timed per stage). searched, when given, is filled with the item names
+    whose search completed (hit or miss), so callers can tell failed or skipped items apart.
+    Items (names or (itemCode, itemName) pairs) may be a list or an async stream of batches - workers pull from a bounded queue,
+    so scraping starts as soon as the first batch arrives.
+    With an http_client, workers search over HTTP and only launch a browser as a fallback.
+    """
+    crew = ScraperCrew(num_browsers, http_client=http_client, metrics=metrics)
+    try:
+        return await crew.run(item_names_to_search, existing_data=existing_data, checkpoint=checkpoint,
+                              negative_cache=negative_cache, products_callback=products_callback, searched=searched)
+    finally:
+        await crew.close()
+
+
+async def save_to_json(data: Dict[str, str], filename: str = JSON_OUTPUT_FILE) -> bool:
+    """Save scraped data to JSON file atomically (write to a temp file, then rename)."""
+    temp_filename = f"{filename}.tmp"
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
+        with open(temp_filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
         logger.info(f"Scraped data saved to {filename}")
         
         # Log some examples
@@ -614,89 +1328,156 @@ async def save_to_json(data: Dict[str, str], filename: str = JSON_OUTPUT_FILE):
             logger.info("Sample products saved:")
             for i, (name, url) in enumerate(list(data.items())[:3]):
                 logger.info(f"  {i+1}. {name} -> {url[:50]}...")
+        return True
     except IOError as e:
         logger.error(f"Error writing JSON to file: {e}")
+        return False
 
 
-async def main_json_only():
-    """Optimized main function focused on building comprehensive JSON file."""
+async def main_json_only(stream_to_db: bool = False):
+    """
+    Optimized main function focused on building comprehensive JSON file.
+    With stream_to_db, scraped images are matched and written to grocery.imageUrl while
+    scraping runs (see ImageUpdateWriter) and the intermediate JSON file is skipped.
+    """
     global scraped_data_global
     
     # Setup signal handlers for graceful shutdown
     setup_signal_handlers()
     
-    logger.info("🚀 Starting FAST JSON-ONLY scraping process for items WITHOUT existing imageUrls.")
+    if stream_to_db:
+        logger.info("🚀 Starting STREAMING scraping process: images go straight to the database.")
+    else:
+        logger.info("🚀 Starting FAST JSON-ONLY scraping process for items WITHOUT existing imageUrls.")
 
     db_manager = DatabaseManager()
+    http_client = HttpSearchClient() if SEARCH_BACKEND == "http" else None
+    num_workers = HTTP_WORKERS if http_client else 10
+    checkpoint = CheckpointStore()
+    negative_cache = NegativeSearchCache()
+    metrics = SearchMetrics()
+    name_index = None
+    image_writer = None
 
     try:
-        # 1. Load existing JSON to avoid re-scraping
+        # 1. Load existing JSON and replay the checkpoint of an interrupted run
         logger.info("📁 Loading existing JSON data...")
         existing_data = await load_existing_json()
+        checkpoint.open()
+        negative_cache.open()
+        metrics.open()
+        for name, url in checkpoint.products.items():
+            existing_data.setdefault(name, url)
         
-        # 2. Connect to database and get products WITHOUT images
+        # 2. Connect to database (products WITHOUT images are streamed while scraping)
         logger.info("🔗 Connecting to database...")
         await db_manager.connect()
         
-        products_without_images = await db_manager.get_products_without_images()
-        
-        if not products_without_images:
-            logger.info("✅ No products in database need image scraping. Exiting.")
-            return
-
-        logger.info(f"📦 Products without images in database: {len(products_without_images)}")
         logger.info(f"📊 Already scraped: {len(existing_data)}")
-        
-        # 3. Filter out items we might have already searched for
-        remaining_items = []
-        skipped_count = 0
-        for item in products_without_images:
-            if not is_search_term_covered(item, existing_data):
-                remaining_items.append(item)
-            else:
-                skipped_count += 1
-        
-        logger.info(f"⏭️  Skipping {skipped_count} items likely already covered")
-        logger.info(f"🎯 Remaining to process: {len(remaining_items)} items")
-        
-        if not remaining_items:
-            logger.info("✅ All items appear to be covered already. Final save...")
-            await save_to_json(existing_data)
-            return
 
-        print(f"\n🚀 FAST PARALLEL PROCESSING MODE (10 Browsers):")
+        if stream_to_db:
+            # Matches and writes run in a background task fed by the workers
+            name_index = await db_manager.open_name_index()
+            image_writer = ImageUpdateWriter(db_manager.db, NameMatcher(name_index=name_index))
+            image_writer.start()
+            # Products replayed from an interrupted run's checkpoint were never written
+            await image_writer.put_products(checkpoint.products)
+        
+        # 3. Filter out items we already searched for, known misses, and likely covered items
+        stream_stats = {'streamed': 0, 'skipped': 0, 'cached_misses': 0, 'queued': 0, 'barcodes': 0}
+
+        async def remaining_item_batches():
+            item_batches = (db_manager.iter_items_by_popularity() if QUEUE_ORDER == "popularity"
+                            else db_manager.iter_items_without_images())
+            async for batch in item_batches:
+                remaining_batch = []
+                for item_code, item in batch:
+                    stream_stats['streamed'] += 1
+                    barcode = is_valid_barcode(item_code)
+                    if checkpoint.is_searched(item):
+                        stream_stats['skipped'] += 1
+                    elif negative_cache.is_cached_miss(item):
+                        stream_stats['cached_misses'] += 1
+                    elif item in existing_data or (not barcode and is_search_term_covered(item, existing_data)):
+                        stream_stats['skipped'] += 1
+                    else:
+                        stream_stats['barcodes'] += barcode
+                        remaining_batch.append((item_code, item))
+                stream_stats['queued'] += len(remaining_batch)
+                if remaining_batch:
+                    yield remaining_batch
+
+        print(f"\n🚀 FAST PARALLEL PROCESSING MODE ({num_workers} workers, {SEARCH_BACKEND} backend):")
         print(f"   📁 Existing products: {len(existing_data)}")
-        print(f"   🎯 Items to process: {len(remaining_items)}")
-        print(f"   🤖 Browsers: 10 parallel instances")
-        print(f"   💾 Progress saves: Every 50 items per browser + combined every 500")
-        print(f"   ⚡ Expected duration: ~{len(remaining_items) * 0.05 / 60:.1f} minutes (~10x faster)")
+        print(f"   🎯 Items: streamed from the database in batches of {STREAM_BATCH_SIZE} ({QUEUE_ORDER} order)")
+        if http_client:
+            print(f"   🌐 HTTP workers: {num_workers} (up to {MAX_FALLBACK_BROWSERS} fallback browsers)")
+        else:
+            print(f"   🤖 Browsers: {num_workers} parallel instances")
+        print(f"   💾 Checkpoint: every completed search appended to {checkpoint.filename}")
+        print(f"   📈 Metrics: per-search timings appended to {metrics.filename}")
+        if image_writer:
+            print(f"   🗄️  Database: matched images written in micro-batches while scraping")
         print("="*80)
 
-        # 4. Disconnect from database (we don't need it anymore)
-        await db_manager.disconnect()
-
-        # 5. Start fast PARALLEL scraping (browsers will be created automatically)
+        # 4. Start fast PARALLEL scraping (browsers will be created automatically)
         logger.info("🔍 Starting FAST PARALLEL search and extraction process...")
+        if http_client:
+            await http_client.open()
         final_scraped_data = await scrape_parallel(
-            remaining_items, 
+            remaining_item_batches(), 
             existing_data=existing_data,
-            num_browsers=10,
-            save_interval=100
+            num_browsers=num_workers,
+            save_interval=100,
+            http_client=http_client,
+            checkpoint=checkpoint,
+            negative_cache=negative_cache,
+            products_callback=image_writer.put_products if image_writer else None,
+            metrics=metrics
         )
 
-        # 6. Final save
-        logger.info("💾 Saving final comprehensive JSON...")
-        await save_to_json(final_scraped_data)
+        writer_stats = None
+        if image_writer:
+            writer_stats = await image_writer.close()
+            image_writer = None
+
+        # 5. Disconnect from database (we don't need it anymore)
+        await db_manager.disconnect()
+
+        logger.info(f"📦 Products without images in database: {stream_stats['streamed']}")
+        logger.info(f"⏭️  Skipped {stream_stats['skipped']} items likely already covered")
+        logger.info(f"🚫 Skipped {stream_stats['cached_misses']} items with a cached miss (not expired yet)")
+        logger.info(f"🎯 Processed: {stream_stats['queued']} items ({stream_stats['barcodes']} with a valid barcode looked up by barcode first)")
+
+        if stream_stats['streamed'] == 0:
+            logger.info("✅ No products in database need image scraping.")
+
+        # 6. Final save (the checkpoint is only needed until the results are safely stored)
+        if writer_stats is not None:
+            if writer_stats['failed'] == 0:
+                checkpoint.discard()
+            else:
+                logger.warning(f"⚠️  {writer_stats['failed']} streamed updates failed; keeping {checkpoint.filename}")
+        else:
+            logger.info("💾 Saving final comprehensive JSON...")
+            if await save_to_json(final_scraped_data):
+                checkpoint.discard()
         
         # 7. Results summary
         new_products = len(final_scraped_data) - len(existing_data)
         
         print(f"\n🎉 IMAGE SCRAPING FOR MISSING ITEMS COMPLETED!")
-        print(f"   📦 Items without images processed: {len(products_without_images)}")
+        print(f"   📦 Items without images processed: {stream_stats['streamed']}")
         print(f"   📊 Total unique products found: {len(final_scraped_data)}")
         print(f"   ✨ New products added: {new_products}")
-        print(f"   📁 JSON saved to: {JSON_OUTPUT_FILE}")
-        print(f"   📈 Success rate: {len(final_scraped_data) / len(products_without_images) * 100:.1f}% coverage")
+        if writer_stats is not None:
+            print(f"   🔗 Matched to grocery rows: {writer_stats['matched']} of {writer_stats['received']} products")
+            print(f"   🗄️  Database rows updated: {writer_stats['updated']}")
+        else:
+            print(f"   📁 JSON saved to: {JSON_OUTPUT_FILE}")
+        searches = metrics.summary.searches
+        print(f"   🎯 Search hit rate (searched item found): {metrics.summary.outcomes['hit'] / max(searches, 1) * 100:.1f}% "
+              f"of {searches} searches ({metrics.summary.pages_with_products} result pages had products)")
         print("="*80)
 
     except mysql.connector.Error as e:
@@ -704,7 +1485,20 @@ async def main_json_only():
     except Exception as e:
         logger.critical(f"💥 Unexpected critical error occurred: {e}", exc_info=True)
     finally:
-        # Cleanup
+        # Cleanup (flush whatever the writer still holds before the pool goes away)
+        if image_writer:
+            try:
+                await image_writer.close()
+            except Exception as e:
+                logger.error(f"❌ Image writer failed: {e}")
+        if name_index is not None:
+            name_index.close()
+        checkpoint.close()
+        negative_cache.close()
+        metrics.log_report()
+        metrics.close()
+        if http_client:
+            await http_client.close()
         if db_manager:
             await db_manager.disconnect()
         logger.info("🏁 Fast JSON-only scraping process finished.")
@@ -716,14 +1510,21 @@ async def main():
     logger.info("💡 TIP: Use 'python fine_grocery_image.py fast' for optimized JSON-only processing")
 
     db_manager = DatabaseManager()
-    scraper = SupermarketScraper(headless=True)
+    scraper = SupermarketScraper(headless=True, profile_slot=0)
+    checkpoint = CheckpointStore()
+    negative_cache = NegativeSearchCache()
 
     try:
         # 1. Database Integration: Connect and get product names
         logger.info("🔗 Connecting to database...")
         await db_manager.connect()
         
-        product_names_to_search_for = await db_manager.get_products_without_images()
+        checkpoint.open()
+        negative_cache.open()
+        product_names_to_search_for = [
+            name for name in await db_manager.get_products_without_images()
+            if not checkpoint.is_searched(name) and not negative_cache.is_cached_miss(name)
+        ]
         
         if not product_names_to_search_for:
             logger.info("✅ No products in the database need image scraping. Exiting.")
@@ -735,16 +1536,24 @@ async def main():
         logger.info("🚀 Setting up browser automation...")
         await scraper.setup_playwright()
         
-        scraped_products_data = await scraper.scrape_for_item_names_fast(product_names_to_search_for)
+        scraped_products_data = await scraper.scrape_for_item_names_fast(
+            product_names_to_search_for,
+            existing_data=dict(checkpoint.products),
+            checkpoint=checkpoint,
+            negative_cache=negative_cache
+        )
 
         if scraped_products_data:
             logger.info(f"✅ Total unique products scraped: {len(scraped_products_data)}")
-            await save_to_json(scraped_products_data)
-            print(f"📁 JSON saved to: {JSON_OUTPUT_FILE}")
+            if await save_to_json(scraped_products_data):
+                checkpoint.discard()
+                print(f"📁 JSON saved to: {JSON_OUTPUT_FILE}")
 
     except Exception as e:
         logger.critical(f"💥 Unexpected critical error occurred: {e}", exc_info=True)
     finally:
+        checkpoint.close()
+        negative_cache.close()
         if scraper:
             await scraper.close_playwright()
         if db_manager:
@@ -752,6 +1561,107 @@ async def main():
         logger.info("🏁 Scraping process finished.")
 
 
+async def main_worker():
+    """
+    Distributed worker: claim leased batches from the shared MySQL work queue, scrape them,
+    stream matched images into the database and complete the batch. Run any number of
+    workers on any number of hosts; fill the queue with 'python work_queue.py refresh'.
+    """
+    logger.info("🚀 Starting image scraping WORKER on the shared work queue.")
+
+    db_manager = DatabaseManager()
+    http_client = HttpSearchClient() if SEARCH_BACKEND == "http" else None
+    num_workers = HTTP_WORKERS if http_client else 10
+    negative_cache = NegativeSearchCache()
+    metrics = SearchMetrics()
+    # One crew for every batch, so browsers and their profiles are launched once per worker
+    crew = ScraperCrew(num_workers, http_client=http_client, metrics=metrics)
+    name_index = None
+    image_writer = None
+    lease = None
+    totals = {'batches': 0, 'items': 0, 'found': 0}
+
+    try:
+        negative_cache.open()
+        metrics.open()
+        await db_manager.connect()
+        work_queue = WorkQueue(db_manager.db)
+        await work_queue.create_table()
+
+        name_index = await db_manager.open_name_index()
+        image_writer = ImageUpdateWriter(db_manager.db, NameMatcher(name_index=name_index))
+        image_writer.start()
+        if http_client:
+            await http_client.open()
+
+        while True:
+            lease = await work_queue.claim(CLAIM_BATCH_SIZE)
+            if lease is None:
+                logger.info("✅ No claimable items left in the work queue.")
+                break
+
+            heartbeat_task = asyncio.create_task(work_queue.heartbeat(lease))
+            searched = set()
+            try:
+                batch_results = await crew.run(
+                    list(lease.items),
+                    existing_data={},
+                    negative_cache=negative_cache,
+                    products_callback=image_writer.put_products,
+                    searched=searched
+                )
+            finally:
+                heartbeat_task.cancel()
+
+            # Exact-name hits (including barcode hits) are recorded per item; every other
+            # product on the result pages was already matched and written by the image writer.
+            # Items whose search failed are left out, so complete() hands them back to the queue
+            results = {item_code: batch_results.get(item_name)
+                       for item_code, item_name in lease.items if item_name in searched}
+            requeued = len(lease) - len(results)
+            completed = await work_queue.complete(lease, results)
+            lease = None
+
+            totals['batches'] += 1
+            totals['items'] += completed
+            totals['found'] += sum(1 for url in results.values() if url)
+            logger.info(f"📤 Completed batch {totals['batches']}: {completed} items, {requeued} failed searches "
+                        f"handed back | Totals: {totals}")
+
+        writer_stats = await image_writer.close()
+        image_writer = None
+        print(f"\n🎉 WORKER FINISHED!")
+        print(f"   📦 Batches completed: {totals['batches']} ({totals['items']} items)")
+        print(f"   🏷️  Items with an exact image hit: {totals['found']}")
+        print(f"   🗄️  Database rows updated: {writer_stats['updated']}")
+        print(f"   📊 Queue status: {await work_queue.counts()}")
+        print("="*80)
+
+    except mysql.connector.Error as e:
+        logger.critical(f"💥 Critical MySQL error occurred: {e}")
+    except Exception as e:
+        logger.critical(f"💥 Unexpected critical error occurred: {e}", exc_info=True)
+    finally:
+        if lease and db_manager.db.is_connected:
+            # Hand unfinished items back instead of waiting for the lease to expire
+            await WorkQueue(db_manager.db).release(lease)
+        if image_writer:
+            try:
+                await image_writer.close()
+            except Exception as e:
+                logger.error(f"❌ Image writer failed: {e}")
+        if name_index is not None:
+            name_index.close()
+        negative_cache.close()
+        metrics.log_report()
+        metrics.close()
+        await crew.close()
+        if http_client:
+            await http_client.close()
+        await db_manager.disconnect()
+        logger.info("🏁 Worker finished.")
+
+
 async def demo_single_search():
     """Demo function to test single product search."""
     print("🧪 Demo: Testing single product search...")
@@ -792,11 +1702,27 @@ if __name__ == "__main__":
         elif sys.argv[1] == "parallel":
             # Run parallel process (same as fast, but explicit): python fine_grocery_image.py parallel
             asyncio.run(main_json_only())
+        elif sys.argv[1] == "stream":
+            # Scrape and write images to the database in one pass: python find_grocery_image.py stream
+            asyncio.run(main_json_only(stream_to_db=True))
+        elif sys.argv[1] == "worker":
+            # Claim batches from the shared work queue: python find_grocery_image.py worker
+            asyncio.run(main_worker())
+        elif sys.argv[1] == "crawl":
+            # Harvest every category listing instead of searching: python find_grocery_image.py crawl
+            from catalog_crawler import main_crawl
+            asyncio.run(main_crawl())
         else:
             print("Usage:")
             print("  python find_grocery_image.py          # Original process")
-            print("  python find_grocery_image.py fast     # Fast parallel process (10 browsers)")
-            print("  python find_grocery_image.py parallel # Fast parallel process (10 browsers)")
+            print("  python find_grocery_image.py fast     # Fast parallel process (HTTP workers, browser fallback)")
+            print("  python find_grocery_image.py parallel # Fast parallel process (HTTP workers, browser fallback)")
+            print("  python find_grocery_image.py stream   # Fast process writing images straight to the database")
+            print("  python find_grocery_image.py crawl    # Crawl category listings into the JSON file")
+            print("  python find_grocery_image.py worker   # Process batches from the shared work queue (work_queue.py)")
+            print()
+            print("Set IMAGE_SEARCH_BACKEND=browser to search with Playwright only.")
+            print("Set IMAGE_QUEUE_ORDER=table to scrape in itemCode order instead of most popular first.")
             print("  python find_grocery_image.py demo     # Demo with 2 test products")
     else:
         # Run original process: python fine_grocery_image.py
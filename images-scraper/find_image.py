@@ -2,13 +2,23 @@
 import sys
 import io
 import time
-import random
 import os
+import csv
+import json
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from search_cache import ImageLookupCache
+import rate_limiter
+from rate_limiter import get_limiter, limiter_for_url, looks_blocked
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 import tempfile
 from urllib.parse import quote_plus
 
@@ -18,14 +28,38 @@ from selenium.webdriver.support import expected_conditions as EC
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+# Lookup service configuration
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.getenv("FIND_IMAGE_PORT", "8765"))
+DRIVER_POOL_SIZE = int(os.getenv("FIND_IMAGE_POOL_SIZE", "3"))
+DRIVER_ACQUIRE_TIMEOUT = 120  # seconds a lookup waits for a free browser
+HEADLESS = os.getenv("FIND_IMAGE_HEADLESS", "0") == "1"
+QUERY_TIMEOUT = float(os.getenv("FIND_IMAGE_QUERY_TIMEOUT", "45"))  # seconds per batch lookup
+
+class SearchUnavailableError(RuntimeError):
+    """The search never reached the results grid (block page, timeout, browser error), so it says nothing about the query."""
+
+class DriverUnavailableError(SearchUnavailableError):
+    """No browser could be started or borrowed, so the lookup did not actually run."""
+
+_lookup_cache = None
+_lookup_cache_lock = threading.Lock()
+
+def get_lookup_cache() -> ImageLookupCache:
+    """Open the shared lookup cache on first use."""
+    global _lookup_cache
+    with _lookup_cache_lock:
+        if _lookup_cache is None:
+            _lookup_cache = ImageLookupCache()
+            _lookup_cache.open()
+        return _lookup_cache
+
 def setup_chrome_driver():
     """Setup Chrome driver with fallback options"""
     options = Options()
     
-    # Use a clean temporary profile to avoid conflicts
-    # Note: This temp_dir is not automatically cleaned up by this script.
-    # For long-running services, consider adding cleanup logic (e.g., using shutil.rmtree).
-    temp_dir = tempfile.mkdtemp()
+    # Use a clean temporary profile to avoid conflicts (removed again by close_chrome_driver)
+    temp_dir = tempfile.mkdtemp(prefix="find_image_")
     options.add_argument(f"--user-data-dir={temp_dir}")
     
     options.add_argument("--no-sandbox")
@@ -38,28 +72,133 @@ def setup_chrome_driver():
     options.add_argument("--disable-web-security")
     options.add_argument("--allow-running-insecure-content")
     options.add_argument("--disable-features=VizDisplayCompositor")
-    # Consider adding options.add_argument("--headless=new") if running in a headless environment
+    if HEADLESS:
+        options.add_argument("--headless=new")
     
     try:
         driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(QUERY_TIMEOUT)  # A hung page load must not pin a pooled driver
+        driver.profile_dir = temp_dir
         return driver
     except Exception as e:
         print(f"Error setting up Chrome driver: {e}", file=sys.stderr)
+        shutil.rmtree(temp_dir, ignore_errors=True)
         return None
 
+def close_chrome_driver(driver):
+    """Quit a driver and delete its temporary profile."""
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Error quitting Chrome driver: {e}", file=sys.stderr)
+    profile_dir = getattr(driver, "profile_dir", None)
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+class DriverPool:
+    """
+    Pool of warm Chrome drivers shared by concurrent lookups.
+    Drivers are started lazily up to `size`, reused between lookups, and replaced
+    when a lookup leaves one broken. close() quits them all and removes their profiles.
+    """
+
+    def __init__(self, size: int = DRIVER_POOL_SIZE):
+        self.size = size
+        self.idle = queue.LifoQueue()  # Most recently used driver first (warmest cache)
+        self.started = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def acquire(self, timeout: float = DRIVER_ACQUIRE_TIMEOUT):
+        """Borrow a driver, starting a new one while the pool is below its size."""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            can_start = self.started < self.size
+            if can_start:
+                self.started += 1
+        if can_start:
+            driver = setup_chrome_driver()
+            if driver is None:
+                with self.lock:
+                    self.started -= 1
+            return driver
+        try:
+            return self.idle.get(timeout=timeout)
+        except queue.Empty:
+            print(f"No browser became free within {timeout}s", file=sys.stderr)
+            return None
+
+    def release(self, driver, broken: bool = False):
+        """Return a driver to the pool (broken drivers are closed and replaced on demand)."""
+        if broken or self.closed:
+            close_chrome_driver(driver)
+            with self.lock:
+                self.started -= 1
+            return
+        try:
+            # Leave the next lookup a blank page instead of the last result grid
+            driver.get("about:blank")
+        except WebDriverException:
+            self.release(driver, broken=True)
+            return
+        self.idle.put(driver)
+
+    def warm_up(self):
+        """Start every driver up front so the first lookups don't pay the browser start."""
+        drivers = [self.acquire() for _ in range(self.size)]
+        for driver in drivers:
+            if driver:
+                self.release(driver)
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            close_chrome_driver(driver)
+            with self.lock:
+                self.started -= 1
+
 def is_valid_barcode(code: str) -> bool:
     return code.isdigit() and len(code) == 13
 
-def search_google_images(query: str) -> str | None:
-    """Search Google Images and return the URL of the first relevant image from the top results."""
-    driver = setup_chrome_driver()
+def search_google_images(query: str, pool: DriverPool | None = None,
+                         raise_if_unavailable: bool = False) -> str | None:
+    """
+    Search Google Images and return the URL of the first relevant image from the top results.
+    With a pool the search borrows a warm driver; otherwise a one-off driver is started.
+    With raise_if_unavailable, a search that never got to the results grid (no browser, a
+    block page, a timeout or a browser error) raises SearchUnavailableError instead of
+    returning None, so None only means the results had no usable image.
+    """
+    driver = pool.acquire() if pool else setup_chrome_driver()
     if not driver:
+        if raise_if_unavailable:
+            raise DriverUnavailableError(f"No browser available for \"{query}\"")
         return None
+    broken = False
     
     try:
         encoded_query = quote_plus(query)
         search_url = f"https://www.google.com/search?q={encoded_query}&tbm=isch&safe=off"
-        driver.get(search_url)
+        # The host's adaptive limiter paces searches across all pooled drivers (and backs off when blocked)
+        with limiter_for_url(search_url).permit() as permit:
+            try:
+                driver.get(search_url)
+            except TimeoutException:
+                permit.report(rate_limiter.TIMEOUT)
+                raise
+            if "/sorry/" in driver.current_url or looks_blocked(driver.page_source):
+                permit.report(rate_limiter.BLOCKED)
+                print(f"Google served a block page for query: \"{query}\"", file=sys.stderr)
+                if raise_if_unavailable:
+                    raise SearchUnavailableError(f"Google served a block page for \"{query}\"")
+                return None
         
         print(f"Navigated to Google Images search for query: \"{query}\"", file=sys.stderr)
         
@@ -103,6 +242,8 @@ def search_google_images(query: str) -> str | None:
                 # with open("debug_page_source_timeout.html", "w", encoding="utf-8") as f:
                 #    f.write(driver.page_source)
                 # print("Saved page source to debug_page_source_timeout.html", file=sys.stderr)
+                if raise_if_unavailable:
+                    raise SearchUnavailableError(f"Image results for \"{query}\" did not load")
                 return None
         
         # Find all image result divs. These are containers for individual image thumbnails.
@@ -164,8 +305,13 @@ def search_google_images(query: str) -> str | None:
         print("No image with a suitable 'src' attribute (starting with 'http' and not a filtered gstatic URL) found in the processed results.", file=sys.stderr)
         return None
             
+    except SearchUnavailableError:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in search_google_images: {e}", file=sys.stderr)
+        broken = isinstance(e, WebDriverException) and not isinstance(e, TimeoutException)
+        if raise_if_unavailable:
+            raise SearchUnavailableError(f"Search for \"{query}\" failed: {e}") from e
         # For debugging, you might want to save page source or screenshot here
         # if driver:
         #     try:
@@ -177,8 +323,10 @@ def search_google_images(query: str) -> str | None:
         #         print(f"Could not save page source: {ex_save}", file=sys.stderr)
         return None
     finally:
-        if driver:
-            driver.quit()
+        if pool:
+            pool.release(driver, broken=broken)
+        else:
+            close_chrome_driver(driver)
 
 def search_google_photos(query: str) -> str | None:
     """Search Google Photos and return the first image URL"""
@@ -188,7 +336,8 @@ def search_google_photos(query: str) -> str | None:
     
     try:
         # Open Google Photos
-        driver.get("https://photos.google.com")
+        with get_limiter("photos.google.com").permit():
+            driver.get("https://photos.google.com")
         
         # Wait for page load and login
         time.sleep(10)
@@ -197,7 +346,7 @@ def search_google_photos(query: str) -> str | None:
         current_url = driver.current_url
         if "accounts.google.com" in current_url or "signin" in current_url or "myaccount.google.com" in current_url:
             print("Google Photos requires login. Falling back to Google Images search.", file=sys.stderr)
-            driver.quit()
+            close_chrome_driver(driver)
             return search_google_images(query) # This recursive call might be problematic if search_google_images also fails.
         
         # Find the search box and enter search query
@@ -219,7 +368,7 @@ def search_google_photos(query: str) -> str | None:
             
             if not search_box:
                 print("Could not find search box, falling back to Google Images", file=sys.stderr)
-                driver.quit()
+                close_chrome_driver(driver)
                 return search_google_images(query)
                 
             search_box.click()
@@ -258,37 +407,267 @@ def search_google_photos(query: str) -> str | None:
                     return None
             else:
                 print("No photos found in search results, trying Google Images", file=sys.stderr)
-                driver.quit()
+                close_chrome_driver(driver)
                 return search_google_images(query)
                 
         except NoSuchElementException as e:
             print(f"Element not found in Google Photos, falling back to Google Images: {e}", file=sys.stderr)
-            driver.quit()
+            close_chrome_driver(driver)
             return search_google_images(query)
             
     except TimeoutException:
         print("Timeout waiting for Google Photos page to load, trying Google Images", file=sys.stderr)
-        driver.quit()
+        close_chrome_driver(driver)
         return search_google_images(query)
     except Exception as e:
         print(f"Error during Google Photos search, trying Google Images: {e}", file=sys.stderr)
-        driver.quit()
+        close_chrome_driver(driver)
         return search_google_images(query)
     finally:
         if driver: # Ensure driver exists before quit
-            driver.quit()
+            close_chrome_driver(driver)
+
+def cached_image_search(query: str, pool: DriverPool | None = None) -> str | None:
+    """
+    Search Google Images through the persistent lookup cache. Hits and misses are both
+    cached, so repeated lookups never start a browser; lookups that never got to the
+    results grid (no browser, block page, timeout, browser error) are not cached.
+    """
+    cache = get_lookup_cache()
+    found, url = cache.get(query)
+    if found:
+        print(f"Cache hit for \"{query}\": {url or 'no image'}", file=sys.stderr)
+        return url
+    try:
+        url = search_google_images(query, pool, raise_if_unavailable=True)
+    except SearchUnavailableError as e:
+        print(str(e), file=sys.stderr)
+        return None
+    cache.put(query, url)
+    return url
 
-def get_product_image_google_photos(itemcode: str, itemname: str) -> str | None:
+def get_product_image_google_photos(itemcode: str, itemname: str, pool: DriverPool | None = None) -> str | None:
     query = itemcode if is_valid_barcode(itemcode) else itemname
     enhanced_query = f"{query} לוגו"
-    return search_google_images(enhanced_query)
+    return cached_image_search(enhanced_query, pool)
 
-def get_subchain_image_google_photos(subchainname: str) -> str | None:
+def get_subchain_image_google_photos(subchainname: str, pool: DriverPool | None = None) -> str | None:
     enhanced_query = f"{subchainname} לוגו"
-    return search_google_images(enhanced_query)
+    return cached_image_search(enhanced_query, pool)
+
+def lookup_image(request: dict, pool: DriverPool | None = None) -> str | None:
+    """
+    Resolve one lookup request:
+    {"mode": "product", "itemcode": ..., "itemname": ...} or {"mode": "subchain", "name": ...}.
+    """
+    mode = (request.get("mode") or "product").lower()
+    if mode == "subchain":
+        subchainname = request.get("name") or request.get("subchainname") or ""
+        if not subchainname:
+            raise ValueError("Subchain name not provided for subchain mode.")
+        return get_subchain_image_google_photos(subchainname, pool)
+
+    itemcode = str(request.get("itemcode") or "")
+    itemname = request.get("itemname") or ""
+    if not (itemcode or itemname):
+        raise ValueError("Item code or item name not provided for product mode.")
+    return get_product_image_google_photos(itemcode, itemname, pool)
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """GET /product?itemcode=..&itemname=.. or /subchain?name=.. -> {"url": ...}"""
+    pool: DriverPool = None
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/health":
+            self._respond(200, {"status": "ok"})
+            return
+        mode = parsed.path.strip("/")
+        if mode not in ("product", "subchain"):
+            self._respond(404, {"error": f"Unknown lookup '{parsed.path}'"})
+            return
+        request = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        request["mode"] = mode
+        try:
+            self._respond(200, {"url": lookup_image(request, self.pool)})
+        except ValueError as e:
+            self._respond(400, {"error": str(e)})
+
+    def _respond(self, status: int, body: dict):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+def serve_http(pool: DriverPool, port: int = SERVICE_PORT):
+    """Serve lookups over HTTP on localhost; each request runs on its own thread."""
+    LookupRequestHandler.pool = pool
+    server = ThreadingHTTPServer((SERVICE_HOST, port), LookupRequestHandler)
+    print(f"Image lookup service listening on http://{SERVICE_HOST}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def serve_stdio(pool: DriverPool):
+    """
+    Serve JSON-lines lookups on stdin/stdout. Requests run concurrently and each response
+    line echoes the request "id", so responses may arrive out of order.
+    """
+    write_lock = threading.Lock()
+
+    def handle(request: dict):
+        response = {"id": request.get("id")}
+        try:
+            response["url"] = lookup_image(request, pool)
+        except Exception as e:
+            response["url"] = None
+            response["error"] = str(e)
+        with write_lock:
+            sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping invalid request line: {e}", file=sys.stderr)
+                continue
+            executor.submit(handle, request)
+
+def read_batch_records(filename: str):
+    """
+    Yield lookup requests from a JSONL file (one request object per line) or a CSV file
+    with mode,itemcode,itemname columns (a header row is optional). Subchain rows carry
+    the subchain name in itemname.
+    """
+    with open(filename, encoding="utf-8-sig", newline="") as f:
+        if filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+
+        for row in csv.reader(f):
+            if not row or row[0].strip().lower() == "mode":
+                continue
+            row += [""] * (3 - len(row))
+            mode, itemcode, itemname = (value.strip() for value in row[:3])
+            if mode.lower() == "subchain":
+                yield {"mode": "subchain", "name": itemname or itemcode}
+            else:
+                yield {"mode": mode or "product", "itemcode": itemcode, "itemname": itemname}
+
+def run_batch(input_file: str, output_file: str | None = None,
+              workers: int = DRIVER_POOL_SIZE, timeout: float = QUERY_TIMEOUT):
+    """
+    Run every record of input_file on a pool of reused drivers and write one JSONL result
+    per record as soon as it completes. Lookups running longer than timeout are reported
+    with status "timeout" (their driver is returned to the pool once the browser gives up).
+    """
+    pool = DriverPool(workers)
+    output = open(output_file, "w", encoding="utf-8") if output_file else sys.stdout
+    started_at = {}
+    counts = {"ok": 0, "miss": 0, "timeout": 0, "error": 0}
+
+    def run_record(request: dict, future_id: int):
+        started_at[future_id] = time.monotonic()
+        return lookup_image(request, pool)
+
+    def write_result(request: dict, status: str, url: str | None = None, error: str | None = None,
+                     seconds: float | None = None):
+        counts[status] += 1
+        result = dict(request, url=url, status=status)
+        if error:
+            result["error"] = error
+        if seconds is not None:
+            result["seconds"] = round(seconds, 2)
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+    records = read_batch_records(input_file)
+    in_flight = {}
+    submitted = 0
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        exhausted = False
+        while not exhausted or in_flight:
+            # Keep a bounded number of records queued ahead of the drivers
+            while not exhausted and len(in_flight) < workers * 2:
+                request = next(records, None)
+                if request is None:
+                    exhausted = True
+                    break
+                future_id = submitted
+                submitted += 1
+                future = executor.submit(run_record, request, future_id)
+                in_flight[future] = (request, future_id)
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                request, future_id = in_flight.pop(future)
+                seconds = time.monotonic() - started_at.get(future_id, time.monotonic())
+                try:
+                    url = future.result()
+                    write_result(request, "ok" if url else "miss", url, seconds=seconds)
+                except Exception as e:
+                    write_result(request, "error", error=str(e), seconds=seconds)
+
+            now = time.monotonic()
+            for future, (request, future_id) in list(in_flight.items()):
+                if future_id in started_at and now - started_at[future_id] > timeout:
+                    del in_flight[future]
+                    write_result(request, "timeout", seconds=now - started_at[future_id])
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        pool.close()
+        if output is not sys.stdout:
+            output.close()
+        if _lookup_cache:
+            _lookup_cache.close()
+    print(f"Batch finished: {counts}", file=sys.stderr)
+
+def run_service(mode: str, port: int = SERVICE_PORT):
+    pool = DriverPool()
+    try:
+        pool.warm_up()
+        if mode == "serve":
+            serve_http(pool, port)
+        else:
+            serve_stdio(pool)
+    finally:
+        pool.close()
+        if _lookup_cache:
+            _lookup_cache.close()
 
 if __name__ == "__main__":
-    time.sleep(random.uniform(1, 3)) # Reduced random delay, original was 6-12s
+    if len(sys.argv) > 1 and sys.argv[1].lower() in ("serve", "stdio"):
+        # Resident service: python find_image.py serve [port] | python find_image.py stdio
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else SERVICE_PORT
+        run_service(sys.argv[1].lower(), port)
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "batch":
+        # Batch lookups: python find_image.py batch <records.csv|records.jsonl> [results.jsonl]
+        if len(sys.argv) < 3:
+            print("Usage: python find_image.py batch <records.csv|records.jsonl> [results.jsonl]", file=sys.stderr)
+            sys.exit(1)
+        run_batch(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        sys.exit(0)
 
     mode = sys.argv[1].lower() if len(sys.argv) > 1 else "product"
     url = None # Initialize url
@@ -0,0 +1,237 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse, unquote
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# Fallback values match the local docker-compose development database
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'dev',
+    'password': 'dev123',
+    'database': 'groczi',
+    'port': 3306
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+BULK_UPDATE_CHUNK_SIZE = 5000
+
+
+def load_db_config() -> Dict[str, Any]:
+    """
+    Build the MySQL configuration from the environment.
+    DATABASE_URL (the same variable Prisma uses) wins; otherwise DB_HOST, DB_PORT,
+    DB_USER/MYSQL_USER, DB_PASSWORD/MYSQL_PASSWORD and DB_NAME/MYSQL_DATABASE are used.
+    """
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        parsed = urlparse(database_url)
+        return {
+            'host': parsed.hostname or DEFAULT_DB_CONFIG['host'],
+            'user': unquote(parsed.username or DEFAULT_DB_CONFIG['user']),
+            'password': unquote(parsed.password or ''),
+            'database': parsed.path.lstrip('/') or DEFAULT_DB_CONFIG['database'],
+            'port': parsed.port or DEFAULT_DB_CONFIG['port']
+        }
+
+    return {
+        'host': os.getenv("DB_HOST", DEFAULT_DB_CONFIG['host']),
+        'user': os.getenv("DB_USER") or os.getenv("MYSQL_USER") or DEFAULT_DB_CONFIG['user'],
+        'password': os.getenv("DB_PASSWORD") or os.getenv("MYSQL_PASSWORD") or DEFAULT_DB_CONFIG['password'],
+        'database': os.getenv("DB_NAME") or os.getenv("MYSQL_DATABASE") or DEFAULT_DB_CONFIG['database'],
+        'port': int(os.getenv("DB_PORT", DEFAULT_DB_CONFIG['port']))
+    }
+
+
+class AsyncDatabase:
+    """
+    Connection-pooled MySQL access for asyncio code.
+    Blocking mysql.connector calls run on a dedicated thread pool of pool_size threads,
+    so queries never block the event loop driving the browsers. Each thread keeps its
+    own connection, opened on first use; all of them are tracked so close() can close them.
+    """
+
+    def __init__(self, config: Dict = None, pool_size: int = DB_POOL_SIZE, pool_name: str = "images"):
+        self.config = config or load_db_config()
+        self.pool_size = pool_size
+        self.pool_name = pool_name
+        self.executor = None
+        self.connections: List[Any] = []
+        self._connections_lock = threading.Lock()
+        self._thread_state = threading.local()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.executor is not None
+
+    def _open_connection(self):
+        connection = mysql.connector.connect(autocommit=False, use_unicode=True, charset='utf8mb4', **self.config)
+        with self._connections_lock:
+            self.connections.append(connection)
+        self._thread_state.connection = connection
+        return connection
+
+    def _discard_connection(self, connection):
+        self._thread_state.connection = None
+        with self._connections_lock:
+            if connection in self.connections:
+                self.connections.remove(connection)
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _thread_connection(self):
+        """The calling DB thread's connection, (re)opened when missing or dropped by the server."""
+        connection = getattr(self._thread_state, 'connection', None)
+        if connection is None:
+            return self._open_connection()
+        if not connection.is_connected():
+            connection.reconnect()
+        return connection
+
+    async def connect(self):
+        """Start the DB threads and open a first connection to validate the configuration."""
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix=f"{self.pool_name}-db")
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._open_connection)
+            logger.info(f"✅ Connected to {self.config['database']}@{self.config['host']} (pool of {self.pool_size}).")
+        except mysql.connector.Error as err:
+            logger.error(f"❌ Error connecting to database: {err}")
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            raise
+
+    async def close(self):
+        """Stop the worker threads, then close every connection they opened."""
+        if not self.executor:
+            return
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        with self._connections_lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except mysql.connector.Error as err:
+                logger.warning(f"⚠️  Error closing database connection: {err}")
+        self._thread_state = threading.local()
+        logger.info(f"✅ Database pool closed ({len(connections)} connections).")
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Run func(connection, *args) on the DB thread pool with that thread's connection."""
+        if not self.executor:
+            raise RuntimeError("Database not connected. Call connect() first.")
+
+        def call():
+            connection = self._thread_connection()
+            try:
+                return func(connection, *args)
+            finally:
+                try:
+                    connection.reset_session()  # Ends open transactions/snapshots before the next call reuses it
+                except mysql.connector.Error:
+                    self._discard_connection(connection)  # Reopened on this thread's next call
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def fetch_all(self, query: str, params: Optional[Sequence] = None) -> List[Dict[str, Any]]:
+        """Run a SELECT and return all rows as dictionaries."""
+        def call(connection):
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        return await self.run(call)
+
+    async def fetch_one(self, query: str, params: Optional[Sequence] = None) -> Optional[Dict[str, Any]]:
+        """Run a SELECT and return the first row as a dictionary."""
+        rows = await self.fetch_all(query, params)
+        return rows[0] if rows else None
+
+    async def execute(self, query: str, params: Optional[Sequence] = None) -> int:
+        """Run a single write statement in its own transaction. Returns the affected row count."""
+        def call(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, params)
+                connection.commit()
+                return cursor.rowcount
+            except mysql.connector.Error:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        return await self.run(call)
+
+    async def execute_many(self, query: str, params_seq: Sequence[Sequence]) -> int:
+        """Run a write statement for many parameter sets in one transaction. Returns the affected row count."""
+        def call(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, params_seq)
+                connection.commit()
+                return cursor.rowcount
+            except mysql.connector.Error:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        return await self.run(call)
+
+    async def bulk_update_image_urls(self, updates: Sequence[Tuple[str, str]],
+                                     chunk_size: int = BULK_UPDATE_CHUNK_SIZE,
+                                     only_missing: bool = False) -> int:
+        """
+        Apply many (itemCode, imageUrl) pairs with set-based statements: each chunk is
+        loaded into a temporary table with one multi-row INSERT and applied with a single
+        joined UPDATE. With only_missing, rows that already have an image are left alone.
+        Returns the number of grocery rows actually changed.
+        """
+        update_query = (
+            "UPDATE grocery g JOIN tmp_image_updates t ON g.itemCode = t.itemCode "
+            "SET g.imageUrl = t.imageUrl"
+        )
+        if only_missing:
+            update_query += " WHERE g.imageUrl IS NULL OR g.imageUrl = ''"
+
+        def call(connection):
+            cursor = connection.cursor()
+            updated_rows = 0
+            try:
+                cursor.execute(
+                    "CREATE TEMPORARY TABLE IF NOT EXISTS tmp_image_updates ("
+                    "itemCode VARCHAR(20) NOT NULL PRIMARY KEY, "
+                    "imageUrl VARCHAR(500) NOT NULL)"
+                )
+                for start in range(0, len(updates), chunk_size):
+                    chunk = updates[start:start + chunk_size]
+                    cursor.execute("DELETE FROM tmp_image_updates")
+                    placeholders = ", ".join(["(%s, %s)"] * len(chunk))
+                    params = [value for pair in chunk for value in pair]
+                    cursor.execute(
+                        f"INSERT INTO tmp_image_updates (itemCode, imageUrl) VALUES {placeholders} "
+                        f"ON DUPLICATE KEY UPDATE imageUrl = VALUES(imageUrl)",
+                        params
+                    )
+                    cursor.execute(update_query)
+                    updated_rows += cursor.rowcount
+                    connection.commit()
+                return updated_rows
+            except mysql.connector.Error:
+                connection.rollback()
+                raise
+            finally:
+                # The connection is reused by later calls, so don't leave the table behind
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_image_updates")
+                cursor.close()
+
+        if not updates:
+            return 0
+        return await self.run(call)
@@ -0,0 +1,272 @@
+import os
+import io
+import sys
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import aiohttp
+from image_db import AsyncDatabase
+from find_grocery_image import USER_AGENT
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are skipped without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+MIRROR_DIR = os.getenv("IMAGE_MIRROR_DIR", "image_mirror")
+# Absolute URL where the backend serves MIRROR_DIR (e.g. https://api.example.com/images); clients
+# render grocery.imageUrl directly, so a relative URL would not load
+MIRROR_BASE_URL = os.getenv("IMAGE_MIRROR_BASE_URL", "")
+LEGACY_RELATIVE_PREFIX = "/images/"  # Mirrored URLs stored before the base URL had to be absolute
+THUMBNAIL_DIR_NAME = "thumbs"
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_QUALITY = 80
+DOWNLOAD_CONCURRENCY = 20
+DOWNLOAD_TIMEOUT_SECONDS = 30
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+MIRROR_PAGE_SIZE = 1000
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+]
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """Return the file extension for JPEG/PNG/GIF/WebP data, or None for anything else."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+def require_absolute_base_url(base_url: str) -> str:
+    if urlparse(base_url).scheme not in ("http", "https") or not urlparse(base_url).netloc:
+        raise ValueError(
+            f"IMAGE_MIRROR_BASE_URL must be an absolute http(s) URL of the backend's /images route, got {base_url!r}"
+        )
+    return base_url.rstrip("/")
+
+
+def write_atomic(path: str, data: bytes):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def make_thumbnail(data: bytes, path: str):
+    """Fit the image into THUMBNAIL_SIZE on a white square canvas and save it as WebP."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        image.thumbnail(THUMBNAIL_SIZE)
+        canvas = Image.new("RGB", THUMBNAIL_SIZE, (255, 255, 255))
+        offset = ((THUMBNAIL_SIZE[0] - image.width) // 2, (THUMBNAIL_SIZE[1] - image.height) // 2)
+        canvas.paste(image, offset, image)
+        buffer = io.BytesIO()
+        canvas.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY)
+    write_atomic(path, buffer.getvalue())
+
+
+class ImageMirror:
+    """
+    Downloads remote image URLs once and stores them content-addressed:
+    MIRROR_DIR/<sha256>.<ext> plus a WebP thumbnail in MIRROR_DIR/thumbs/<sha256>.webp.
+    Identical images behind different URLs share one file.
+    """
+
+    def __init__(self, directory: str = MIRROR_DIR, base_url: str = MIRROR_BASE_URL,
+                 concurrency: int = DOWNLOAD_CONCURRENCY):
+        self.directory = directory
+        self.base_url = require_absolute_base_url(base_url)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = None
+        self.mirrored: Dict[str, Optional[str]] = {}  # Remote URL -> local URL (None when it failed)
+        self.stats = {'downloaded': 0, 'deduplicated': 0, 'failed': 0, 'truncated': 0, 'thumbnails': 0}
+
+    async def open(self):
+        os.makedirs(os.path.join(self.directory, THUMBNAIL_DIR_NAME), exist_ok=True)
+        if Image is None:
+            logger.warning("⚠️  Pillow is not installed; mirroring without thumbnails.")
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=DOWNLOAD_CONCURRENCY, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT_SECONDS),
+            headers={"User-Agent": USER_AGENT}
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def mirror(self, url: str) -> Optional[str]:
+        """Return the local URL for a remote image, downloading it the first time it is seen."""
+        if url.startswith(self.base_url + "/"):
+            return url  # Already one of ours
+        if url not in self.mirrored:
+            self.mirrored[url] = await self._download(url)
+        return self.mirrored[url]
+
+    async def _download(self, url: str) -> Optional[str]:
+        async with self.semaphore:
+            try:
+                async with self.session.get(url) as response:
+                    if response.status != 200:
+                        logger.debug(f"Download of {url} returned status {response.status}")
+                        self.stats['failed'] += 1
+                        return None
+                    data = await self._read_body(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug(f"Download of {url} failed: {e}")
+                self.stats['failed'] += 1
+                return None
+
+        if data is None:
+            logger.debug(f"Skipping {url}: too large or truncated")
+            self.stats['truncated'] += 1
+            return None
+        extension = sniff_image_type(data)
+        if extension is None:
+            logger.debug(f"Skipping {url}: not a supported image")
+            self.stats['failed'] += 1
+            return None
+
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{digest}.{extension}"
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            self.stats['deduplicated'] += 1
+        else:
+            write_atomic(path, data)
+            self.stats['downloaded'] += 1
+
+        thumbnail_path = os.path.join(self.directory, THUMBNAIL_DIR_NAME, f"{digest}.webp")
+        if Image is not None and not os.path.exists(thumbnail_path):
+            try:
+                # Decoding and resizing is CPU-bound, keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, make_thumbnail, data, thumbnail_path)
+                self.stats['thumbnails'] += 1
+            except Exception as e:
+                logger.debug(f"Thumbnail for {url} failed: {e}")
+
+        return f"{self.base_url}/{filename}"
+
+    @staticmethod
+    async def _read_body(response: aiohttp.ClientResponse) -> Optional[bytes]:
+        """
+        Read the whole body (read(n) only returns what is buffered so far). Returns None when
+        it exceeds MAX_IMAGE_BYTES or ends short of Content-Length, so no partial file is stored.
+        """
+        expected = response.content_length
+        if expected is not None and expected > MAX_IMAGE_BYTES:
+            return None
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                return None
+            chunks.append(chunk)
+        # Content-Length counts the encoded bytes, so it can only be checked for unencoded bodies
+        encoded = response.headers.get("Content-Encoding", "identity").lower() != "identity"
+        if expected is not None and not encoded and size != expected:
+            return None
+        return b"".join(chunks)
+
+    async def mirror_many(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """Mirror a batch of URLs concurrently."""
+        unique_urls = list(dict.fromkeys(urls))
+        local_urls = await asyncio.gather(*(self.mirror(url) for url in unique_urls))
+        return dict(zip(unique_urls, local_urls))
+
+
+async def mirror_grocery_images(db: AsyncDatabase, mirror: ImageMirror, page_size: int = MIRROR_PAGE_SIZE) -> int:
+    """Mirror every remote grocery.imageUrl (keyset scan, skipping mirrored ones) and point the rows at the local copies."""
+    updated = 0
+    last_item_code = ''
+    while True:
+        rows = await db.fetch_all(
+            "SELECT itemCode, imageUrl FROM grocery WHERE itemCode > %s AND imageUrl LIKE 'http%%' "
+            "AND imageUrl NOT LIKE CONCAT(%s, '/%%') ORDER BY itemCode LIMIT %s",
+            (last_item_code, mirror.base_url, page_size)
+        )
+        if not rows:
+            break
+        last_item_code = rows[-1]['itemCode']
+
+        local_urls = await mirror.mirror_many([row['imageUrl'] for row in rows])
+        updates = [
+            (row['itemCode'], local_urls[row['imageUrl']])
+            for row in rows if local_urls.get(row['imageUrl'])
+        ]
+        updated += await db.bulk_update_image_urls(updates)
+        logger.info(f"🪞 Mirrored up to {last_item_code}: {updated} grocery rows updated | {mirror.stats}")
+    return updated
+
+
+async def absolutize_mirrored_urls(db: AsyncDatabase, base_url: str) -> int:
+    """Rewrite mirrored URLs stored as relative /images/... paths to the absolute base URL."""
+    total = 0
+    for table in ("grocery", "subchains"):
+        total += await db.execute(
+            f"UPDATE {table} SET imageUrl = CONCAT(%s, SUBSTRING(imageUrl, %s)) WHERE imageUrl LIKE %s",
+            (base_url + "/", len(LEGACY_RELATIVE_PREFIX) + 1, LEGACY_RELATIVE_PREFIX + "%")
+        )
+    return total
+
+
+async def mirror_subchain_images(db: AsyncDatabase, mirror: ImageMirror) -> int:
+    """Mirror the (few) remote subchain logos."""
+    rows = await db.fetch_all(
+        "SELECT ChainId, SubChainId, imageUrl FROM subchains WHERE imageUrl LIKE 'http%%' "
+        "AND imageUrl NOT LIKE CONCAT(%s, '/%%')",
+        (mirror.base_url,)
+    )
+    local_urls = await mirror.mirror_many([row['imageUrl'] for row in rows])
+    updates: List[Tuple[str, str, str]] = [
+        (local_urls[row['imageUrl']], row['ChainId'], row['SubChainId'])
+        for row in rows if local_urls.get(row['imageUrl'])
+    ]
+    if not updates:
+        return 0
+    return await db.execute_many(
+        "UPDATE subchains SET imageUrl = %s WHERE ChainId = %s AND SubChainId = %s", updates
+    )
+
+
+async def main():
+    db = AsyncDatabase(pool_name="image_mirror")
+    mirror = ImageMirror()
+    await db.connect()
+    await mirror.open()
+    try:
+        relative_fixed = await absolutize_mirrored_urls(db, mirror.base_url)
+        grocery_updated = await mirror_grocery_images(db, mirror)
+        subchains_updated = 0 if "--grocery-only" in sys.argv else await mirror_subchain_images(db, mirror)
+
+        print(f"\n🪞 IMAGE MIRROR COMPLETED!")
+        print(f"   🌐 Unique URLs processed: {len(mirror.mirrored)}")
+        print(f"   💾 New files stored: {mirror.stats['downloaded']}")
+        print(f"   🔁 Duplicates sharing a file: {mirror.stats['deduplicated']}")
+        print(f"   🖼️  Thumbnails created: {mirror.stats['thumbnails']}")
+        print(f"   ❌ Failed downloads: {mirror.stats['failed']} (+{mirror.stats['truncated']} too large or truncated)")
+        print(f"   🔗 Relative mirrored URLs made absolute: {relative_fixed}")
+        print(f"   🗄️  Rows updated: {grocery_updated} grocery, {subchains_updated} subchains")
+        print(f"   📁 Files in: {os.path.abspath(mirror.directory)} (served at {mirror.base_url})")
+    finally:
+        await mirror.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+from find_grocery_image import HttpSearchClient, SupermarketScraper, FallbackBrowserPool, is_valid_image_url
+from name_matcher import NameMatcher
+
+logger = logging.getLogger(__name__)
+
+HEDGE_DELAY_SECONDS = float(os.getenv("IMAGE_HEDGE_DELAY_SECONDS", "3"))  # Wait for the primary before hedging
+SHUFERSAL_DEADLINE_SECONDS = 20
+GOOGLE_DEADLINE_SECONDS = 45
+GOOGLE_WORKERS = 2  # Selenium lookups running at once (each holds a Chrome driver)
+
+GOOGLE_REJECTED_PATTERNS = [
+    "gstatic.com/images/branding/searchlogo",
+    "gstatic.com/images/icons",
+    "gstatic.com/images/cleardot.gif"
+]
+
+
+class ResolvedImage(NamedTuple):
+    url: str
+    source: str
+    seconds: float
+
+
+class ImageSource(ABC):
+    """An image source queried by the resolver. fetch() returns a candidate URL or None."""
+
+    name = "source"
+    deadline = 30.0
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def fetch(self, item_code: str, item_name: str) -> Optional[str]:
+        ...
+
+    def validate(self, url: Optional[str]) -> bool:
+        return bool(url)
+
+
+class ShufersalSource(ImageSource):
+    """
+    Shufersal search (HTTP first, one fallback browser). Only a tile whose name matches
+    the item is accepted, so a search that returns related products is not a hit.
+    """
+
+    name = "shufersal"
+    deadline = SHUFERSAL_DEADLINE_SECONDS
+
+    def __init__(self):
+        self.http_client = HttpSearchClient()
+        self.fallback_browsers = FallbackBrowserPool(1)
+        self.scraper = SupermarketScraper(headless=True, http_client=self.http_client,
+                                          fallback_browsers=self.fallback_browsers)
+
+    async def open(self):
+        await self.http_client.open()
+
+    async def close(self):
+        await self.fallback_browsers.close()
+        await self.http_client.close()
+
+    async def fetch(self, item_code: str, item_name: str) -> Optional[str]:
+        products = await self.scraper.find_products(item_name, item_code)
+        if not products:
+            return None
+        # Index the tiles as "items" keyed by their image URL and match the item name against them
+        match = NameMatcher((url, name) for name, url in products.items()).match(item_name)
+        return match.item_codes[0] if match else None
+
+    def validate(self, url: Optional[str]) -> bool:
+        return is_valid_image_url(url)
+
+
+class GoogleImagesSource(ImageSource):
+    """
+    Google Images through find_image.py's warm driver pool and lookup cache.
+
+    Lookups run in a thread pool, where cancelling the awaiting task can't stop them. A
+    lookup abandoned while still queued (it lost the race or missed its deadline) never
+    starts; one that already started keeps a driver busy until it finishes (and fills the
+    cache). Both kinds are counted in abandoned.
+    """
+
+    name = "google"
+    deadline = GOOGLE_DEADLINE_SECONDS
+
+    def __init__(self, workers: int = GOOGLE_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.pool = None
+        self.lock = threading.Lock()
+        self.abandoned = {'queued': 0, 'running': 0}
+
+    async def open(self):
+        import find_image  # Selenium is only needed when this source is used
+        self.find_image = find_image
+        self.pool = find_image.DriverPool(self.workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="google-images")
+
+    async def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+
+    def _lookup(self, lookup: Dict[str, bool], item_code: str, item_name: str) -> Optional[str]:
+        with self.lock:
+            if lookup['cancelled']:
+                return None
+            lookup['started'] = True
+        return self.find_image.get_product_image_google_photos(item_code, item_name, self.pool)
+
+    async def fetch(self, item_code: str, item_name: str) -> Optional[str]:
+        lookup = {'cancelled': False, 'started': False}
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._lookup, lookup, item_code, item_name
+            )
+        except asyncio.CancelledError:
+            with self.lock:
+                lookup['cancelled'] = True
+                self.abandoned['running' if lookup['started'] else 'queued'] += 1
+            raise
+
+    def validate(self, url: Optional[str]) -> bool:
+        return bool(url) and url.startswith("http") and not any(p in url for p in GOOGLE_REJECTED_PATTERNS)
+
+
+class HedgedImageResolver:
+    """
+    Resolves an item's image from several sources in priority order.
+
+    The first source starts immediately. Each further source is only launched when
+    everything running so far has failed, or has not produced a valid image within
+    hedge_delay seconds. Every source runs under its own deadline, and the first
+    validated URL wins; the sources still running are then cancelled and counted as
+    abandoned (neither a win nor a timeout).
+    """
+
+    def __init__(self, sources: List[ImageSource], hedge_delay: float = HEDGE_DELAY_SECONDS):
+        self.sources = sources
+        self.hedge_delay = hedge_delay
+        self.stats = {source.name: {'launched': 0, 'won': 0, 'failed': 0, 'timeouts': 0, 'abandoned': 0}
+                      for source in sources}
+
+    async def open(self):
+        await asyncio.gather(*(source.open() for source in self.sources))
+
+    async def close(self):
+        await asyncio.gather(*(source.close() for source in self.sources), return_exceptions=True)
+
+    async def _run_source(self, source: ImageSource, item_code: str, item_name: str) -> Optional[str]:
+        stats = self.stats[source.name]
+        stats['launched'] += 1
+        try:
+            url = await asyncio.wait_for(source.fetch(item_code, item_name), timeout=source.deadline)
+        except asyncio.TimeoutError:
+            stats['timeouts'] += 1
+            logger.debug(f"{source.name} missed its {source.deadline}s deadline for '{item_name}'")
+            return None
+        except asyncio.CancelledError:
+            stats['abandoned'] += 1  # Another source won first
+            raise
+        except Exception as e:
+            stats['failed'] += 1
+            logger.debug(f"{source.name} failed for '{item_name}': {e}")
+            return None
+        if not source.validate(url):
+            stats['failed'] += 1
+            return None
+        return url
+
+    async def resolve(self, item_code: str, item_name: str) -> Optional[ResolvedImage]:
+        """Return the first validated image for the item, or None when every source fails."""
+        started = time.monotonic()
+        pending = {}
+        next_source = 0
+        try:
+            while True:
+                if next_source < len(self.sources):
+                    source = self.sources[next_source]
+                    next_source += 1
+                    task = asyncio.create_task(self._run_source(source, item_code, item_name))
+                    pending[task] = source
+                    if next_source > 1:
+                        logger.debug(f"Hedging '{item_name}' with {source.name}")
+                elif not pending:
+                    return None
+
+                # Wait for a result, but only up to the hedge delay while another source is left
+                timeout = self.hedge_delay if next_source < len(self.sources) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source = pending.pop(task)
+                    url = task.result()
+                    if url:
+                        self.stats[source.name]['won'] += 1
+                        return ResolvedImage(url, source.name, time.monotonic() - started)
+                # Nothing valid yet: either the hedge delay passed or a source failed - launch the next one
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def main():
+    if len(sys.argv) < 3:
+        print("Usage: python image_resolver.py <itemCode> <itemName>")
+        return
+
+    resolver = HedgedImageResolver([ShufersalSource(), GoogleImagesSource()])
+    await resolver.open()
+    try:
+        result = await resolver.resolve(sys.argv[1], " ".join(sys.argv[2:]))
+        if result:
+            logger.info(f"✅ {result.source} answered in {result.seconds:.1f}s: {result.url}")
+            print(result.url)
+        else:
+            logger.info("❌ No source found a valid image.")
+            print("")
+        logger.info(f"📊 Source stats: {resolver.stats}")
+        for source in resolver.sources:
+            if isinstance(source, GoogleImagesSource):
+                logger.info(f"⏭️  Abandoned Google lookups: {source.abandoned['queued']} dropped before starting, "
+                            f"{source.abandoned['running']} left running")
+    finally:
+        await resolver.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
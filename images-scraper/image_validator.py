@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import struct
+import asyncio
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import aiohttp
+import rate_limiter
+from image_db import AsyncDatabase
+from image_mirror import MIRROR_DIR, MIRROR_BASE_URL, LEGACY_RELATIVE_PREFIX, sniff_image_type
+from find_grocery_image import USER_AGENT, PLACEHOLDER_IMAGE_URL, PLACEHOLDER_PATTERNS
+from rate_limiter import limiter_for_url, limiter_stats, looks_blocked, outcome_for_status, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_CONCURRENCY = 50
+VALIDATION_TIMEOUT_SECONDS = 15
+VALIDATION_PAGE_SIZE = 1000
+HEADER_BYTES = 32 * 1024  # Enough for the dimensions of practically every JPEG/PNG/GIF/WebP
+MIN_IMAGE_DIMENSION = 64  # Smaller images are icons or tracking pixels, not product photos
+REPORT_FILE = "image_validation_report.jsonl"
+
+DEAD_STATUS_CODES = {404, 410, 451}  # Anything else (5xx, timeouts) is retried next pass
+BLOCKED_STATUS_CODES = {401, 403}  # Hotlink protection or a bot wall - says nothing about the image itself
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageCheck(NamedTuple):
+    status: str  # "ok", "dead", "not_image", "tiny", "placeholder" or "unreachable"
+    image_type: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    detail: Optional[str] = None
+
+    @property
+    def needs_rescrape(self) -> bool:
+        return self.status in ("dead", "not_image", "tiny", "placeholder")
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    position = 2
+    while position + 9 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # Fill byte
+            position += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # Markers without a length
+            position += 2
+            continue
+        segment_length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[position + 5:position + 9])
+            return width, height
+        position += 2 + segment_length
+    return None
+
+
+def _webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def parse_image_header(data: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Return (image type, (width, height)) from the first bytes of a file; either may be None."""
+    image_type = sniff_image_type(data)
+    if image_type == "png" and len(data) >= 24:
+        return image_type, struct.unpack(">II", data[16:24])
+    if image_type == "gif" and len(data) >= 10:
+        return image_type, struct.unpack("<HH", data[6:10])
+    if image_type == "jpg":
+        return image_type, _jpeg_dimensions(data)
+    if image_type == "webp":
+        return image_type, _webp_dimensions(data)
+    return image_type, None
+
+
+def is_placeholder_url(url: str) -> bool:
+    url_lower = url.lower()
+    return url == PLACEHOLDER_IMAGE_URL or any(pattern in url_lower for pattern in PLACEHOLDER_PATTERNS)
+
+
+def classify_image(data: bytes) -> ImageCheck:
+    image_type, dimensions = parse_image_header(data)
+    if image_type is None:
+        return ImageCheck("not_image")
+    if dimensions is None:
+        return ImageCheck("ok", image_type)  # Unusual layout - don't throw away a real image
+    width, height = dimensions
+    status = "tiny" if min(width, height) < MIN_IMAGE_DIMENSION else "ok"
+    return ImageCheck(status, image_type, width, height)
+
+
+class ImageValidator:
+    """
+    Checks stored image URLs by reading only the first HEADER_BYTES of each image
+    (a Range GET for remote URLs, a partial read for mirrored files). Each distinct
+    URL is checked once per run. Remote requests go through the per-host rate limiter,
+    so a host that starts refusing or blocking the validator is backed off from; its
+    images are reported as unreachable rather than dead.
+    """
+
+    def __init__(self, concurrency: int = VALIDATION_CONCURRENCY, mirror_dir: str = MIRROR_DIR,
+                 mirror_base_url: str = MIRROR_BASE_URL):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.mirror_dir = mirror_dir
+        self.mirror_prefix = mirror_base_url.rstrip("/") + "/"
+        self.session = None
+        self.results: Dict[str, ImageCheck] = {}
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=VALIDATION_TIMEOUT_SECONDS),
+            headers={"User-Agent": USER_AGENT, "Range": f"bytes=0-{HEADER_BYTES - 1}"}
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def check(self, url: str) -> ImageCheck:
+        if url not in self.results:
+            self.results[url] = await self._check(url)
+        return self.results[url]
+
+    async def _check(self, url: str) -> ImageCheck:
+        if is_placeholder_url(url):
+            return ImageCheck("placeholder")
+        if url.startswith(self.mirror_prefix):
+            return self._check_mirrored(url[len(self.mirror_prefix):])
+        if url.startswith(LEGACY_RELATIVE_PREFIX):
+            return self._check_mirrored(url[len(LEGACY_RELATIVE_PREFIX):])
+        if not url.startswith("http"):
+            return ImageCheck("dead", detail="not an http(s) URL")
+
+        async with limiter_for_url(url).permit() as permit, self.semaphore:
+            try:
+                async with self.session.get(url) as response:
+                    if response.status in BLOCKED_STATUS_CODES:
+                        permit.report(rate_limiter.BLOCKED)
+                        return ImageCheck("unreachable", detail=f"HTTP {response.status}")
+                    if response.status in DEAD_STATUS_CODES:
+                        return ImageCheck("dead", detail=f"HTTP {response.status}")
+                    if response.status not in (200, 206):
+                        permit.report(outcome_for_status(response.status),
+                                      parse_retry_after(response.headers.get("Retry-After")))
+                        return ImageCheck("unreachable", detail=f"HTTP {response.status}")
+                    data = await self._read_header(response)
+            except asyncio.TimeoutError:
+                permit.report(rate_limiter.TIMEOUT)
+                return ImageCheck("unreachable", detail="timeout")
+            except aiohttp.ClientError as e:
+                permit.report(rate_limiter.ERROR)
+                return ImageCheck("unreachable", detail=str(e) or type(e).__name__)
+
+            check = classify_image(data)
+            if check.status == "not_image" and looks_blocked(data.decode("utf-8", errors="ignore")):
+                permit.report(rate_limiter.BLOCKED)
+                return ImageCheck("unreachable", detail="block page")
+        return check
+
+    @staticmethod
+    async def _read_header(response: aiohttp.ClientResponse) -> bytes:
+        """
+        Read up to HEADER_BYTES (read(n) only returns what is buffered so far). Servers that
+        ignore Range send the whole file, so reading stops once the header is in.
+        """
+        data = bytearray()
+        async for chunk in response.content.iter_chunked(HEADER_BYTES):
+            data += chunk
+            if len(data) >= HEADER_BYTES:
+                break
+        return bytes(data[:HEADER_BYTES])
+
+    def _check_mirrored(self, filename: str) -> ImageCheck:
+        path = os.path.join(self.mirror_dir, os.path.basename(filename))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(HEADER_BYTES)
+        except OSError:
+            return ImageCheck("dead", detail="mirrored file missing")
+        return classify_image(data)
+
+    async def check_many(self, urls: List[str]) -> Dict[str, ImageCheck]:
+        unique_urls = list(dict.fromkeys(urls))
+        checks = await asyncio.gather(*(self.check(url) for url in unique_urls))
+        return dict(zip(unique_urls, checks))
+
+
+async def validate_grocery_images(db: AsyncDatabase, validator: ImageValidator, report_file: str = REPORT_FILE,
+                                  apply: bool = True, page_size: int = VALIDATION_PAGE_SIZE) -> Dict[str, int]:
+    """
+    Keyset-scan grocery.imageUrl, check every URL and write one report line per row.
+    Rows whose image is dead, not an image, tiny or a placeholder get imageUrl = NULL
+    (unless apply is False), which queues them for the next scraping run.
+    """
+    counts: Dict[str, int] = {}
+    last_item_code = ''
+    with open(report_file, 'w', encoding='utf-8') as report:
+        while True:
+            rows = await db.fetch_all(
+                "SELECT itemCode, imageUrl FROM grocery WHERE itemCode > %s "
+                "AND imageUrl IS NOT NULL AND imageUrl != '' ORDER BY itemCode LIMIT %s",
+                (last_item_code, page_size)
+            )
+            if not rows:
+                break
+            last_item_code = rows[-1]['itemCode']
+
+            checks = await validator.check_many([row['imageUrl'] for row in rows])
+            rescrape = []
+            for row in rows:
+                check = checks[row['imageUrl']]
+                counts[check.status] = counts.get(check.status, 0) + 1
+                if check.needs_rescrape:
+                    rescrape.append(row['itemCode'])
+                report.write(json.dumps({
+                    'itemCode': row['itemCode'],
+                    'imageUrl': row['imageUrl'],
+                    **check._asdict()
+                }, ensure_ascii=False) + "\n")
+
+            if rescrape and apply:
+                placeholders = ", ".join(["%s"] * len(rescrape))
+                await db.execute(f"UPDATE grocery SET imageUrl = NULL WHERE itemCode IN ({placeholders})", rescrape)
+            logger.info(f"🔎 Validated up to {last_item_code}: {counts}")
+    return counts
+
+
+async def main():
+    apply = "--dry-run" not in sys.argv
+    db = AsyncDatabase(pool_name="image_validator")
+    validator = ImageValidator()
+    await db.connect()
+    await validator.open()
+    try:
+        counts = await validate_grocery_images(db, validator, apply=apply)
+        marked = sum(count for status, count in counts.items() if ImageCheck(status).needs_rescrape)
+
+        print(f"\n🔎 IMAGE VALIDATION COMPLETED!")
+        print(f"   🌐 Distinct URLs checked: {len(validator.results)}")
+        for host, stats in limiter_stats().items():
+            print(f"   🚦 {host}: settled at {stats['rate']} req/s, {stats['concurrency']} in flight | {stats}")
+        for status, count in sorted(counts.items()):
+            print(f"   {status}: {count}")
+        if apply:
+            print(f"   ♻️  Rows marked for re-scraping (imageUrl cleared): {marked}")
+        else:
+            print(f"   ♻️  Rows that would be marked for re-scraping: {marked} (dry run)")
+        print(f"   📁 Report saved to: {REPORT_FILE}")
+    finally:
+        await validator.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
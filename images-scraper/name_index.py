@@ -0,0 +1,246 @@
+import os
+import sys
+import mmap
+import struct
+import asyncio
+import logging
+from typing import Iterator, List, Optional, Tuple
+from image_db import AsyncDatabase
+from name_matcher import normalize_name
+
+logger = logging.getLogger(__name__)
+
+NAME_INDEX_FILE = "grocery_name_index.bin"
+INDEX_MAGIC = b"GNIX"
+INDEX_VERSION = 1
+HEADER_FORMAT = "<4sIQ"  # magic, version, record count
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+OFFSET_SIZE = 8
+REFRESH_PAGE_SIZE = 5000
+
+Record = Tuple[str, str, str]  # (normalized key, itemCode, itemName)
+
+
+class NameIndex:
+    """
+    Read-only, memory-mapped index of grocery names.
+
+    File layout: header | key-sorted record offsets | code-sorted record offsets | records,
+    where each record is "key\\0itemCode\\0itemName\\n" in UTF-8. Opening the file maps it
+    without reading it, and lookups binary-search the offset arrays, so startup cost and
+    resident memory stay close to zero regardless of catalog size.
+    """
+
+    def __init__(self, filename: str = NAME_INDEX_FILE):
+        self.filename = filename
+        self._file = None
+        self._mm = None
+        self.count = 0
+
+    def open(self) -> bool:
+        """Map the index file. Returns False when it does not exist yet."""
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) < HEADER_SIZE:
+            return False
+        self._file = open(self.filename, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"{self.filename} is not a version {INDEX_VERSION} name index")
+        return True
+
+    def close(self):
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _offset(self, array: int, position: int) -> int:
+        start = HEADER_SIZE + (array * self.count + position) * OFFSET_SIZE
+        return struct.unpack_from("<Q", self._mm, start)[0]
+
+    def _field(self, offset: int, field: int) -> bytes:
+        """Read field 0 (key), 1 (code) or 2 (name) of the record at offset."""
+        for _ in range(field):
+            offset = self._mm.find(b"\0", offset) + 1
+        end = self._mm.find(b"\n" if field == 2 else b"\0", offset)
+        return self._mm[offset:end]
+
+    def _record(self, offset: int) -> Record:
+        end = self._mm.find(b"\n", offset)
+        key, code, name = self._mm[offset:end].split(b"\0", 2)
+        return key.decode('utf-8'), code.decode('utf-8'), name.decode('utf-8')
+
+    def _lower_bound(self, array: int, field: int, target: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._field(self._offset(array, middle), field) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup_key(self, key: str) -> List[Tuple[str, str]]:
+        """Return (itemCode, itemName) for every row with this normalized key."""
+        if not self._mm:
+            return []
+        target = key.encode('utf-8')
+        results = []
+        position = self._lower_bound(0, 0, target)
+        while position < self.count:
+            record_key, item_code, item_name = self._record(self._offset(0, position))
+            if record_key != key:
+                break
+            results.append((item_code, item_name))
+            position += 1
+        return results
+
+    def lookup(self, item_name: str) -> List[Tuple[str, str]]:
+        """Return (itemCode, itemName) for every row whose name normalizes like item_name."""
+        return self.lookup_key(normalize_name(item_name))
+
+    def contains_code(self, item_code: str) -> bool:
+        if not self._mm:
+            return False
+        target = item_code.encode('utf-8')
+        position = self._lower_bound(1, 1, target)
+        return position < self.count and self._field(self._offset(1, position), 1) == target
+
+    def iter_records(self) -> Iterator[Record]:
+        """Yield all records in normalized-key order."""
+        for position in range(self.count):
+            yield self._record(self._offset(0, position))
+
+    def iter_items(self) -> Iterator[Tuple[str, str]]:
+        """Yield all (itemCode, itemName) pairs."""
+        for _, item_code, item_name in self.iter_records():
+            yield item_code, item_name
+
+
+def write_index(records: List[Record], filename: str = NAME_INDEX_FILE):
+    """Write key-sorted records to a new index file atomically."""
+    records.sort()
+    data = bytearray()
+    offsets = []
+    for key, item_code, item_name in records:
+        offsets.append(len(data))
+        data += f"{key}\0{item_code}\0{item_name}\n".encode('utf-8')
+
+    code_order = sorted(range(len(records)), key=lambda i: records[i][1].encode('utf-8'))
+    count = len(records)
+    data_start = HEADER_SIZE + 2 * count * OFFSET_SIZE
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, count))
+        f.write(struct.pack(f"<{count}Q", *(data_start + o for o in offsets)))
+        f.write(struct.pack(f"<{count}Q", *(data_start + offsets[i] for i in code_order)))
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, filename)
+
+
+def make_record(item_code: str, item_name: str) -> Record:
+    # Names are single-line in the file; the separators never appear in real product names
+    item_name = item_name.replace("\n", " ").replace("\0", "")
+    return normalize_name(item_name), item_code, item_name
+
+
+async def build_name_index(db: AsyncDatabase, filename: str = NAME_INDEX_FILE) -> int:
+    """Build the index from scratch with a keyset scan of grocery. Returns the record count."""
+    records = []
+    last_item_code = ''
+    while True:
+        rows = await db.fetch_all(
+            "SELECT itemCode, itemName FROM grocery WHERE itemCode > %s "
+            "AND itemName IS NOT NULL AND itemName != '' ORDER BY itemCode LIMIT %s",
+            (last_item_code, REFRESH_PAGE_SIZE)
+        )
+        if not rows:
+            break
+        last_item_code = rows[-1]['itemCode']
+        records.extend(make_record(row['itemCode'], row['itemName']) for row in rows)
+
+    write_index(records, filename)
+    logger.info(f"✅ Built name index with {len(records)} items: {filename}")
+    return len(records)
+
+
+async def refresh_name_index(db: AsyncDatabase, filename: str = NAME_INDEX_FILE) -> int:
+    """
+    Add grocery rows whose itemCode is not in the index yet. Only itemCodes are scanned
+    (primary key index); names are fetched just for the new codes. Returns how many were added.
+    """
+    index = NameIndex(filename)
+    if not index.open():
+        return await build_name_index(db, filename)
+
+    try:
+        new_codes = []
+        last_item_code = ''
+        while True:
+            rows = await db.fetch_all(
+                "SELECT itemCode FROM grocery WHERE itemCode > %s ORDER BY itemCode LIMIT %s",
+                (last_item_code, REFRESH_PAGE_SIZE)
+            )
+            if not rows:
+                break
+            last_item_code = rows[-1]['itemCode']
+            new_codes.extend(row['itemCode'] for row in rows if not index.contains_code(row['itemCode']))
+
+        new_records = []
+        for start in range(0, len(new_codes), REFRESH_PAGE_SIZE):
+            chunk = new_codes[start:start + REFRESH_PAGE_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            rows = await db.fetch_all(
+                f"SELECT itemCode, itemName FROM grocery WHERE itemCode IN ({placeholders}) "
+                f"AND itemName IS NOT NULL AND itemName != ''",
+                chunk
+            )
+            new_records.extend(make_record(row['itemCode'], row['itemName']) for row in rows)
+
+        if not new_records:
+            logger.info(f"✅ Name index is up to date ({len(index)} items).")
+            return 0
+
+        merged = list(index.iter_records()) + new_records
+    finally:
+        index.close()
+
+    write_index(merged, filename)
+    logger.info(f"✅ Added {len(new_records)} new items to the name index ({len(merged)} total).")
+    return len(new_records)
+
+
+async def open_name_index(db: Optional[AsyncDatabase] = None, filename: str = NAME_INDEX_FILE) -> NameIndex:
+    """Refresh the index from the database (when given) and map it for reading."""
+    if db is not None:
+        await refresh_name_index(db, filename)
+    index = NameIndex(filename)
+    if not index.open():
+        logger.warning(f"⚠️  Name index {filename} not found. Run 'python name_index.py' to build it.")
+    return index
+
+
+async def main():
+    db = AsyncDatabase(pool_name="name_index")
+    await db.connect()
+    try:
+        if "--rebuild" in sys.argv:
+            await build_name_index(db)
+        else:
+            await refresh_name_index(db)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,249 @@
+import re
+import logging
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FUZZY_MATCH_THRESHOLD = 0.8  # Minimum Dice similarity of character trigrams
+BLOCKING_GRAMS = 6  # Rarest trigrams of a name used to collect candidates
+MAX_POSTING_SIZE = 250  # Trigrams shared by more names than this are too common to block on
+MAX_CANDIDATES = 20  # Candidates scored per name
+LONG_TOKEN_LENGTH = 8  # Differing tokens this long may be 2 edits apart, shorter ones only 1
+
+QUOTE_CHARS_PATTERN = re.compile(r"[\"'`׳״]")
+SEPARATOR_PATTERN = re.compile(r"[\s,;:/\\|()\[\]{}*+_\-]+")
+NUMBER_LETTER_BOUNDARY_PATTERN = re.compile(r"(?<=\d)(?=[^\d\s.%])|(?<=[^\d\s.])(?=\d)")
+NUMBER_PATTERN = re.compile(r"^\d+(\.\d+)?%?$")
+
+# Unit spellings (after quote removal) mapped to one canonical token
+UNIT_ALIASES = {
+    'גרם': 'ג', 'גר': 'ג', 'ג': 'ג', 'gr': 'ג', 'g': 'ג',
+    'קג': 'קג', 'קילו': 'קג', 'kg': 'קג',
+    'מל': 'מל', 'ml': 'מל',
+    'ליטר': 'ל', 'ל': 'ל', 'lt': 'ל',
+    'יח': 'יח', 'יחידה': 'יח', 'יחידות': 'יח',
+}
+
+
+class NameMatch(NamedTuple):
+    item_codes: List[str]
+    item_name: str
+    score: float
+    method: str  # "exact", "normalized", "reordered" or "fuzzy"
+
+
+def tokenize_name(name: str) -> List[str]:
+    """Split a product name into normalized tokens (no quotes, canonical units, numbers split from words)."""
+    name = QUOTE_CHARS_PATTERN.sub("", (name or "").casefold())
+    name = NUMBER_LETTER_BOUNDARY_PATTERN.sub(" ", name)
+    tokens = []
+    for token in SEPARATOR_PATTERN.split(name):
+        if token:
+            tokens.append(UNIT_ALIASES.get(token, token))
+    return tokens
+
+
+def normalize_name(name: str) -> str:
+    """Normalized exact-match key for a product name."""
+    return " ".join(tokenize_name(name))
+
+
+def name_trigrams(tokens: List[str]) -> set:
+    """Character trigrams of each padded token."""
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def within_edits(a: str, b: str, max_edits: int) -> bool:
+    """True if the Levenshtein distance between a and b is at most max_edits."""
+    if abs(len(a) - len(b)) > max_edits:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_edits:
+            return False
+        previous = current
+    return previous[-1] <= max_edits
+
+
+def differs_by_typos(tokens: List[str], candidate_tokens: List[str]) -> bool:
+    """
+    True when the tokens that differ between two names pair up one-to-one as near-typos.
+    An extra or missing word, or a different word (לבן vs חלב), is a different product.
+    """
+    own = list((Counter(tokens) - Counter(candidate_tokens)).elements())
+    other = list((Counter(candidate_tokens) - Counter(tokens)).elements())
+    if len(own) != len(other):
+        return False
+    for token in own:
+        max_edits = 2 if len(token) >= LONG_TOKEN_LENGTH else 1
+        partner = next((i for i, candidate in enumerate(other) if within_edits(token, candidate, max_edits)), None)
+        if partner is None:
+            return False
+        other.pop(partner)
+    return True
+
+
+def find_name_match(name: str, candidates: Iterable[str], threshold: float = FUZZY_MATCH_THRESHOLD) -> Optional[str]:
+    """
+    The candidate naming the same product as name by NameMatcher's rules, or None.
+    Scores every candidate directly, so it suits a short list such as one results page.
+    """
+    tokens = tokenize_name(name)
+    sorted_tokens = sorted(tokens)
+    grams = name_trigrams(tokens)
+    numbers = frozenset(t for t in tokens if NUMBER_PATTERN.match(t))
+
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        candidate_tokens = tokenize_name(candidate)
+        if candidate == name or sorted(candidate_tokens) == sorted_tokens:
+            return candidate
+        if not grams or frozenset(t for t in candidate_tokens if NUMBER_PATTERN.match(t)) != numbers:
+            continue
+        candidate_grams = name_trigrams(candidate_tokens)
+        score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+        if score > best_score and score >= threshold and differs_by_typos(tokens, candidate_tokens):
+            best, best_score = candidate, score
+    return best
+
+
+class NameMatcher:
+    """
+    Matches scraped product names to grocery rows.
+
+    Tries, in order: the exact name, the normalized name, the normalized name with
+    sorted tokens, and finally a fuzzy match. The fuzzy stage blocks on the rarest
+    character trigrams of the name to collect a handful of candidates, scores them
+    with the Dice coefficient, and only accepts candidates whose numbers (sizes,
+    fat percentages) are identical and whose other differing words are near-typos
+    of each other (so flavour and variant words can't differ).
+
+    Items come either from an iterable of (itemCode, itemName) pairs or from a
+    memory-mapped NameIndex. With an index, exact and normalized lookups go straight
+    to the file and the in-memory structures are only built once a name needs them.
+    """
+
+    def __init__(self, items: Optional[Iterable[Tuple[str, str]]] = None,
+                 threshold: float = FUZZY_MATCH_THRESHOLD, name_index=None):
+        self.threshold = threshold
+        self.name_index = name_index
+        self.built = False
+        self.exact: Dict[str, List[str]] = defaultdict(list)
+        self.normalized: Dict[str, List[str]] = defaultdict(list)
+        self.reordered: Dict[str, List[str]] = defaultdict(list)
+        self.display_names: Dict[str, str] = {}  # Normalized or reordered key -> first original name
+
+        # Fuzzy index over distinct normalized names
+        self.keys: List[str] = []
+        self.key_grams: List[set] = []
+        self.key_numbers: List[frozenset] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+        if items is not None:
+            self._build(items)
+
+    def _build(self, items: Iterable[Tuple[str, str]]):
+        for item_code, item_name in items:
+            if not item_name:
+                continue
+            tokens = tokenize_name(item_name)
+            key = " ".join(tokens)
+            self.exact[item_name].append(item_code)
+            if key not in self.normalized:
+                self._index_key(key, tokens)
+                self.display_names[key] = item_name
+            self.normalized[key].append(item_code)
+            reordered_key = " ".join(sorted(tokens))
+            self.display_names.setdefault(reordered_key, item_name)
+            self.reordered[reordered_key].append(item_code)
+
+        self.built = True
+        logger.info(f"🔗 Name matcher ready: {len(self.exact)} names, {len(self.keys)} normalized keys")
+
+    def _index_key(self, key: str, tokens: List[str]):
+        key_id = len(self.keys)
+        grams = name_trigrams(tokens)
+        self.keys.append(key)
+        self.key_grams.append(grams)
+        self.key_numbers.append(frozenset(t for t in tokens if NUMBER_PATTERN.match(t)))
+        for gram in grams:
+            self.postings[gram].append(key_id)
+
+    def match(self, scraped_name: str) -> Optional[NameMatch]:
+        """Find the grocery rows for a scraped product name, or None below the confidence threshold."""
+        tokens = tokenize_name(scraped_name)
+        key = " ".join(tokens)
+
+        if not self.built and self.name_index is not None:
+            rows = self.name_index.lookup_key(key)
+            if rows:
+                exact_codes = [item_code for item_code, item_name in rows if item_name == scraped_name]
+                if exact_codes:
+                    return NameMatch(exact_codes, scraped_name, 1.0, "exact")
+                return NameMatch([item_code for item_code, _ in rows], rows[0][1], 1.0, "normalized")
+            # Reordered and fuzzy matching need the in-memory index
+            self._build(self.name_index.iter_items())
+
+        if scraped_name in self.exact:
+            return NameMatch(self.exact[scraped_name], scraped_name, 1.0, "exact")
+
+        if key in self.normalized:
+            return NameMatch(self.normalized[key], self.display_names[key], 1.0, "normalized")
+
+        reordered_key = " ".join(sorted(tokens))
+        if reordered_key in self.reordered:
+            return NameMatch(self.reordered[reordered_key], self.display_names[reordered_key], 0.99, "reordered")
+
+        return self._fuzzy_match(tokens)
+
+    def _fuzzy_match(self, tokens: List[str]) -> Optional[NameMatch]:
+        grams = name_trigrams(tokens)
+        if not grams:
+            return None
+
+        # Block on the rarest (most selective) trigrams
+        blocking = sorted(
+            (g for g in grams if 0 < len(self.postings.get(g, ())) <= MAX_POSTING_SIZE),
+            key=lambda g: len(self.postings[g])
+        )[:BLOCKING_GRAMS]
+        if not blocking:
+            return None
+
+        candidate_counts = Counter(chain.from_iterable(self.postings[g] for g in blocking))
+        numbers = frozenset(t for t in tokens if NUMBER_PATTERN.match(t))
+
+        best_id, best_score = None, 0.0
+        for key_id, _ in candidate_counts.most_common(MAX_CANDIDATES):
+            if self.key_numbers[key_id] != numbers:
+                continue
+            candidate_grams = self.key_grams[key_id]
+            score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            if score > best_score and score >= self.threshold and differs_by_typos(tokens, self.keys[key_id].split(" ")):
+                best_id, best_score = key_id, score
+
+        if best_id is None or best_score < self.threshold:
+            return None
+        key = self.keys[best_id]
+        return NameMatch(self.normalized[key], self.display_names[key], best_score, "fuzzy")
+
+    def match_all(self, scraped_names: Iterable[str]) -> Tuple[Dict[str, NameMatch], List[str]]:
+        """Match many scraped names. Returns ({scraped_name: match}, [names without a match])."""
+        matches = {}
+        no_matches = []
+        for scraped_name in scraped_names:
+            result = self.match(scraped_name)
+            if result:
+                matches[scraped_name] = result
+            else:
+                no_matches.append(scraped_name)
+        return matches, no_matches
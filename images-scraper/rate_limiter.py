@@ -0,0 +1,263 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Request outcomes reported back to the limiter
+OK = "ok"  # Answered normally - grows the window while latency stays healthy
+MISS = "miss"  # Answered, but the outcome says nothing about the host's health (e.g. no results)
+ERROR = "error"  # Connection errors and 5xx - back off when they pile up
+TIMEOUT = "timeout"  # Back off immediately
+THROTTLED = "throttled"  # 429/503 - back off immediately and honor Retry-After
+BLOCKED = "blocked"  # 403, captcha or bot-wall page - back off immediately
+
+BACKOFF_OUTCOMES = {TIMEOUT, THROTTLED, BLOCKED}
+
+# Per-host defaults; hosts not listed get DEFAULT_HOST_LIMITS
+DEFAULT_HOST_LIMITS = {
+    'rate': 2.0,  # Starting requests per second
+    'max_rate': 20.0,
+    'concurrency': 2,  # Starting number of requests in flight
+    'max_concurrency': 8,
+}
+HOST_LIMITS = {
+    'www.shufersal.co.il': {'rate': 5.0, 'max_rate': 50.0, 'concurrency': 4, 'max_concurrency': 32},
+    'www.google.com': {'rate': 0.5, 'max_rate': 3.0, 'concurrency': 1, 'max_concurrency': 4},
+}
+MIN_RATE = 0.2  # Requests per second never drop below this (one request every 5 seconds)
+BURST_SECONDS = 2.0  # The bucket holds this many seconds worth of tokens
+DECREASE_FACTOR = 0.5  # Multiplicative decrease on back-off
+RATE_INCREASE_FRACTION = 0.02  # Additive rate increase per healthy response, as a fraction of max_rate
+BACKOFF_HOLD_SECONDS = 5.0  # One back-off per this window, so a burst of failures halves the limits once
+LATENCY_TOLERANCE = 2.0  # Latency above this multiple of the baseline latency stops growth
+LATENCY_SMOOTHING = 0.2  # EWMA weight of the newest latency sample
+BASELINE_DRIFT = 0.01  # How fast the baseline drifts up toward the average (so one lucky response can't freeze growth)
+SUCCESS_SMOOTHING = 0.05  # EWMA weight of the newest success/failure
+MIN_SUCCESS_RATE = 0.8  # Below this (errors piling up) the limiter backs off
+WAIT_POLL_SECONDS = 0.05  # How often a request waiting for a free concurrency slot re-checks
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+
+BLOCK_PAGE_MARKERS = (
+    "_Incapsula_Resource",
+    "Request unsuccessful. Incapsula incident",
+    "Attention Required! | Cloudflare",
+    "cf-challenge",
+    "Access Denied</title>",
+    "Our systems have detected unusual traffic",
+)
+
+
+def looks_blocked(html: Optional[str]) -> bool:
+    """True for bot-wall/captcha pages served instead of the requested content."""
+    return bool(html) and any(marker in html for marker in BLOCK_PAGE_MARKERS)
+
+
+def outcome_for_status(status: int) -> str:
+    if status in (429, 503):
+        return THROTTLED
+    if status == 403:
+        return BLOCKED
+    if status >= 500:
+        return ERROR
+    return OK
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form - use the default pause
+
+
+class Permit:
+    """
+    One request to a host. Use it as a context manager (with or async with); the request
+    is reported as OK on a normal exit and as ERROR on an exception, unless report()
+    was called with a more specific outcome.
+    """
+
+    def __init__(self, limiter: "HostLimiter"):
+        self.limiter = limiter
+        self.outcome: Optional[str] = None
+        self.retry_after: Optional[float] = None
+        self.started = 0.0
+
+    def report(self, outcome: str, retry_after: Optional[float] = None):
+        self.outcome = outcome
+        self.retry_after = retry_after
+
+    def _finish(self, failed: bool):
+        outcome = self.outcome or (ERROR if failed else OK)
+        self.limiter.release(outcome, time.monotonic() - self.started, self.retry_after)
+
+    def __enter__(self) -> "Permit":
+        self.limiter.acquire()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._finish(exc_type is not None)
+
+    async def __aenter__(self) -> "Permit":
+        await self.limiter.acquire_async()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # A cancelled request (e.g. a hedged lookup that lost) says nothing about the host
+        if exc_type is asyncio.CancelledError and self.outcome is None:
+            self.outcome = MISS
+        self._finish(exc_type is not None)
+
+
+class HostLimiter:
+    """
+    Adaptive limiter for one host: a token bucket paces request starts and an AIMD window
+    caps the requests in flight.
+
+    Every healthy response (latency within LATENCY_TOLERANCE of the baseline) adds
+    1/window to the window and a small step to the rate, so throughput creeps up while
+    the host keeps up. Timeouts, 429s and block pages halve both (at most once per
+    BACKOFF_HOLD_SECONDS), and a Retry-After pauses the host. Thread-safe: threads use
+    acquire(), coroutines acquire_async(); both only hold the lock for bookkeeping.
+    """
+
+    def __init__(self, host: str, rate: float, max_rate: float, concurrency: int, max_concurrency: int):
+        self.host = host
+        self.rate = rate
+        self.max_rate = max_rate
+        self.window = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.tokens = rate * BURST_SECONDS
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff_until = 0.0
+        self.latency = None  # EWMA of healthy response times
+        self.baseline_latency = None
+        self.success_rate = 1.0
+        self.lock = threading.Lock()
+        self.stats = {outcome: 0 for outcome in (OK, MISS, ERROR, TIMEOUT, THROTTLED, BLOCKED)}
+        self.stats['backoffs'] = 0
+
+    def permit(self) -> Permit:
+        return Permit(self)
+
+    def _try_acquire(self) -> float:
+        """Take a token and a window slot; returns 0 on success, else the seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            if self.in_flight >= int(self.window):
+                return WAIT_POLL_SECONDS
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, outcome: str, latency: float, retry_after: Optional[float] = None):
+        with self.lock:
+            self.in_flight -= 1
+            self.stats[outcome] += 1
+            if outcome == MISS:
+                return
+
+            success = outcome == OK
+            self.success_rate += SUCCESS_SMOOTHING * ((1.0 if success else 0.0) - self.success_rate)
+            if outcome in BACKOFF_OUTCOMES or self.success_rate < MIN_SUCCESS_RATE:
+                if outcome == THROTTLED:
+                    pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS
+                    self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                self._back_off(outcome)
+            elif success:
+                self._grow(latency)
+
+    def _grow(self, latency: float):
+        self.latency = latency if self.latency is None else self.latency + LATENCY_SMOOTHING * (latency - self.latency)
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            drifted = self.baseline_latency + BASELINE_DRIFT * (self.latency - self.baseline_latency)
+            self.baseline_latency = min(latency, drifted)
+        if self.latency > self.baseline_latency * LATENCY_TOLERANCE:
+            return  # The host is slowing down - hold the current limits
+        self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE_FRACTION)
+
+    def _back_off(self, outcome: str):
+        now = time.monotonic()
+        if now < self.backoff_until:
+            return
+        self.backoff_until = now + BACKOFF_HOLD_SECONDS
+        self.window = max(1.0, self.window * DECREASE_FACTOR)
+        self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+        self.tokens = min(self.tokens, 1.0)
+        self.stats['backoffs'] += 1
+        logger.warning(f"🐢 {self.host}: {outcome} - backing off to {self.rate:.1f} req/s, {int(self.window)} in flight")
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                'rate': round(self.rate, 2),
+                'concurrency': int(self.window),
+                'latency': round(self.latency, 3) if self.latency is not None else None,
+                **self.stats
+            }
+
+
+_limiters: Dict[str, HostLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_override(host: str, key: str, default: float) -> float:
+    """RATE_LIMIT_<HOST>_<KEY>, e.g. RATE_LIMIT_WWW_GOOGLE_COM_MAX_RATE=1."""
+    name = f"RATE_LIMIT_{host}_{key}".upper().replace(".", "_").replace("-", "_")
+    return float(os.getenv(name, default))
+
+
+def get_limiter(host: str) -> HostLimiter:
+    """The process-wide limiter for a host (created on first use)."""
+    with _limiters_lock:
+        if host not in _limiters:
+            limits = {**DEFAULT_HOST_LIMITS, **HOST_LIMITS.get(host, {})}
+            _limiters[host] = HostLimiter(
+                host,
+                rate=_env_override(host, 'rate', limits['rate']),
+                max_rate=_env_override(host, 'max_rate', limits['max_rate']),
+                concurrency=int(_env_override(host, 'concurrency', limits['concurrency'])),
+                max_concurrency=int(_env_override(host, 'max_concurrency', limits['max_concurrency']))
+            )
+        return _limiters[host]
+
+
+def limiter_for_url(url: str) -> HostLimiter:
+    return get_limiter(urlparse(url).netloc)
+
+
+def limiter_stats() -> Dict[str, Dict]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.host: limiter.snapshot() for limiter in limiters}
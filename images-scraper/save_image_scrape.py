@@ -5,6 +5,9 @@ import logging
 from typing import Dict, List, Tuple, Optional
 import mysql.connector
 from mysql.connector import Error
+from image_db import AsyncDatabase
+from name_matcher import NameMatcher
+from name_index import NameIndex, open_name_index
 
 # Configure logging
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
@@ -17,72 +20,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database Configuration (same as scraper)
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'dev',
-    'password': 'dev123',
-    'database': 'groczi',
-    'port': 3306
-}
-
 # File paths
 JSON_INPUT_FILE = "scraped_product_images.json"
-BATCH_SIZE = 1000  # Process updates in batches for efficiency
+BATCH_SIZE = 5000  # Updates applied per temp-table chunk
+
+# Streaming writer configuration (used by find_grocery_image.py stream)
+WRITER_QUEUE_SIZE = 2000  # Scraped products buffered before the scrapers are slowed down
+WRITER_BATCH_SIZE = 200  # Matched items per micro-batch
+WRITER_FLUSH_SECONDS = 5.0  # Maximum time a matched item waits before being written
 
 
 class DatabaseUpdater:
-    """Efficient database updater for image URLs."""
+    """Efficient database updater for image URLs (uses the shared async connection pool)."""
     
     def __init__(self, config: Dict = None):
-        self.config = config or DB_CONFIG
-        self.connection = None
-        self.cursor = None
+        self.db = AsyncDatabase(config, pool_name="save_image_scrape")
 
     async def connect(self):
-        """Establish database connection with optimized settings."""
-        try:
-            self.connection = mysql.connector.connect(
-                **self.config,
-                autocommit=False,  # We'll handle commits manually for batching
-                use_unicode=True,
-                charset='utf8mb4'
-            )
-            self.cursor = self.connection.cursor(dictionary=True)
-            logger.info("✅ Successfully connected to the database.")
-        except mysql.connector.Error as err:
-            logger.error(f"❌ Error connecting to database: {err}")
-            raise
+        """Establish the database connection pool."""
+        await self.db.connect()
 
     async def disconnect(self):
-        """Close database connection."""
-        if self.connection and self.connection.is_connected():
-            if self.cursor:
-                self.cursor.close()
-            self.connection.close()
-            logger.info("✅ Successfully disconnected from the database.")
+        """Close the database connection pool."""
+        await self.db.close()
 
-    async def get_existing_items_map(self) -> Dict[str, str]:
-        """Get a map of itemName -> itemCode for all items in database for fast lookups."""
-        if not self.cursor:
-            logger.error("❌ Database not connected. Call connect() first.")
-            return {}
-        
+    async def open_name_index(self) -> NameIndex:
+        """Refresh the memory-mapped name index with new itemCodes and open it for lookups."""
         try:
-            # Get all items with their itemCodes for efficient lookups
-            query = "SELECT itemCode, itemName FROM grocery WHERE itemName IS NOT NULL AND itemName != ''"
-            self.cursor.execute(query)
-            
-            items_map = {}
-            for row in self.cursor.fetchall():
-                items_map[row['itemName']] = row['itemCode']
-            
-            logger.info(f"📊 Loaded {len(items_map)} items from database for matching.")
-            return items_map
-            
+            name_index = await open_name_index(self.db)
+            logger.info(f"📊 Name index ready with {len(name_index)} items for matching.")
+            return name_index
         except mysql.connector.Error as err:
-            logger.error(f"❌ Error fetching existing items: {err}")
-            return {}
+            logger.error(f"❌ Error refreshing the name index: {err}")
+            return await open_name_index()
+
+    async def get_existing_items_map(self) -> Dict[str, str]:
+        """Get a map of itemName -> itemCode for all items (read from the name index)."""
+        name_index = await self.open_name_index()
+        try:
+            return {item_name: item_code for item_code, item_name in name_index.iter_items()}
+        finally:
+            name_index.close()
 
     async def batch_update_images(self, updates: List[Tuple[str, str]]) -> Tuple[int, int]:
         """
@@ -90,40 +68,36 @@ class DatabaseUpdater:
         updates: List of (imageUrl, itemCode) tuples
         Returns: (successful_updates, failed_updates)
         """
-        if not self.cursor or not updates:
+        if not self.db.is_connected or not updates:
             return 0, 0
         
         successful = 0
         failed = 0
         
         try:
-            # Use executemany for efficient batch updates
-            query = "UPDATE grocery SET imageUrl = %s WHERE itemCode = %s"
-            
-            self.cursor.executemany(query, updates)
-            successful = self.cursor.rowcount
-            self.connection.commit()
+            # Set-based update: load the pairs into a temp table and apply one joined UPDATE
+            pairs = [(item_code, image_url) for image_url, item_code in updates]
+            # Only fill missing images: existing (possibly mirrored or hand-fixed) images are kept
+            successful = await self.db.bulk_update_image_urls(pairs, chunk_size=BATCH_SIZE, only_missing=True)
             
             logger.info(f"✅ Batch update successful: {successful} rows updated")
             
         except mysql.connector.Error as err:
             logger.error(f"❌ Error in batch update: {err}")
-            self.connection.rollback()
             failed = len(updates)
             
         return successful, failed
 
     async def update_single_item(self, item_name: str, image_url: str, item_code: str) -> bool:
         """Update a single item's image URL (fallback for failed batch items)."""
-        if not self.cursor:
+        if not self.db.is_connected:
             return False
         
         try:
-            query = "UPDATE grocery SET imageUrl = %s WHERE itemCode = %s"
-            self.cursor.execute(query, (image_url, item_code))
-            self.connection.commit()
+            query = "UPDATE grocery SET imageUrl = %s WHERE itemCode = %s AND (imageUrl IS NULL OR imageUrl = '')"
+            updated_rows = await self.db.execute(query, (image_url, item_code))
             
-            if self.cursor.rowcount > 0:
+            if updated_rows > 0:
                 return True
             else:
                 logger.warning(f"⚠️  No rows updated for item code {item_code} ('{item_name}')")
@@ -135,19 +109,19 @@ class DatabaseUpdater:
 
     async def get_statistics(self) -> Dict[str, int]:
         """Get database statistics for reporting."""
-        if not self.cursor:
+        if not self.db.is_connected:
             return {}
         
         try:
             stats = {}
             
-            # Total items
-            self.cursor.execute("SELECT COUNT(*) as total FROM grocery WHERE itemName IS NOT NULL AND itemName != ''")
-            stats['total_items'] = self.cursor.fetchone()['total']
-            
-            # Items with images
-            self.cursor.execute("SELECT COUNT(*) as with_images FROM grocery WHERE imageUrl IS NOT NULL AND imageUrl != ''")
-            stats['items_with_images'] = self.cursor.fetchone()['with_images']
+            # Total items and items with images (run concurrently on the pool)
+            total_row, with_images_row = await asyncio.gather(
+                self.db.fetch_one("SELECT COUNT(*) as total FROM grocery WHERE itemName IS NOT NULL AND itemName != ''"),
+                self.db.fetch_one("SELECT COUNT(*) as with_images FROM grocery WHERE imageUrl IS NOT NULL AND imageUrl != ''")
+            )
+            stats['total_items'] = total_row['total']
+            stats['items_with_images'] = with_images_row['with_images']
             
             # Items without images
             stats['items_without_images'] = stats['total_items'] - stats['items_with_images']
@@ -159,6 +133,103 @@ class DatabaseUpdater:
             return {}
 
 
+class ImageUpdateWriter:
+    """
+    Background writer that applies scraped images while scraping is still running.
+    Scrapers push (productName, imageUrl) pairs into a bounded queue; the writer matches
+    them to grocery rows and bulk-applies them in micro-batches, flushing when a batch
+    is full or WRITER_FLUSH_SECONDS have passed. Only rows without an image are filled.
+    """
+
+    def __init__(self, db: AsyncDatabase, matcher: NameMatcher,
+                 queue_size: int = WRITER_QUEUE_SIZE,
+                 batch_size: int = WRITER_BATCH_SIZE,
+                 flush_seconds: float = WRITER_FLUSH_SECONDS):
+        self.db = db
+        self.matcher = matcher
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.task = None
+        self.seen_names = set()
+        self.stats = {'received': 0, 'matched': 0, 'unmatched': 0, 'updated': 0, 'failed': 0}
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def put_products(self, products: Dict[str, str]):
+        """Queue scraped products (waits while the queue is full, which throttles the scrapers)."""
+        if self.task and self.task.done():
+            self.task.result()  # Surface the writer's failure instead of blocking on a full queue
+        for product_name, image_url in products.items():
+            if product_name not in self.seen_names:
+                self.seen_names.add(product_name)
+                await self.queue.put((product_name, image_url))
+
+    async def close(self) -> Dict[str, int]:
+        """Flush everything that is queued and stop the writer (raises the writer's failure, if it died)."""
+        if self.task:
+            task, self.task = self.task, None
+            if not task.done():
+                await self.queue.put(None)
+            await task
+        return self.stats
+
+    async def _run(self):
+        pending: List[Tuple[str, str]] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_seconds
+        while True:
+            try:
+                entry = await asyncio.wait_for(self.queue.get(), timeout=max(deadline - loop.time(), 0.01))
+            except asyncio.TimeoutError:
+                entry = False  # Flush interval elapsed
+
+            if entry:
+                pending.append(entry)
+                self.stats['received'] += 1
+            if entry is None or (entry is False and pending) or len(pending) >= self.batch_size:
+                await self._flush(pending)
+                pending = []
+                deadline = loop.time() + self.flush_seconds
+            elif entry is False:
+                deadline = loop.time() + self.flush_seconds
+            if entry is None:
+                break
+
+    async def _flush(self, pending: List[Tuple[str, str]]):
+        if not pending:
+            return
+        scraped = dict(pending)
+        # Matching is CPU-bound (the fuzzy index is built on first use), keep it off the event loop
+        matches, no_matches = await asyncio.get_running_loop().run_in_executor(
+            None, self.matcher.match_all, list(scraped.keys())
+        )
+        self.stats['matched'] += len(matches)
+        self.stats['unmatched'] += len(no_matches)
+
+        best_per_item: Dict[str, Tuple[float, str]] = {}
+        for product_name, match in matches.items():
+            for item_code in match.item_codes:
+                current = best_per_item.get(item_code)
+                if current is None or match.score > current[0]:
+                    best_per_item[item_code] = (match.score, scraped[product_name])
+        if not best_per_item:
+            return
+
+        try:
+            # Result pages are full of products that already have an image - never overwrite those
+            updated = await self.db.bulk_update_image_urls(
+                [(item_code, image_url) for item_code, (_, image_url) in best_per_item.items()],
+                only_missing=True
+            )
+            self.stats['updated'] += updated
+            logger.info(f"🖼️  Streamed {updated} image URLs to the database (total {self.stats['updated']})")
+        except mysql.connector.Error as err:
+            self.stats['failed'] += len(best_per_item)
+            logger.error(f"❌ Error applying streamed image updates: {err}")
+
+
 async def load_scraped_data(filename: str = JSON_INPUT_FILE) -> Dict[str, str]:
     """Load scraped product data from JSON file."""
     try:
@@ -202,6 +273,7 @@ async def process_image_updates():
     
     # 2. Connect to database
     db_updater = DatabaseUpdater()
+    name_index = None
     
     try:
         await db_updater.connect()
@@ -216,31 +288,39 @@ async def process_image_updates():
             logger.info(f"   Items with images: {initial_stats.get('items_with_images', 0)}")
             logger.info(f"   Items without images: {initial_stats.get('items_without_images', 0)}")
         
-        # 4. Get existing items map for fast lookups
-        logger.info("🔍 Building fast lookup map...")
-        existing_items_map = await db_updater.get_existing_items_map()
+        # 4. Open the name index behind the matcher (exact, normalized and fuzzy lookups)
+        logger.info("🔍 Opening name index...")
+        name_index = await db_updater.open_name_index()
         
-        if not existing_items_map:
+        if not len(name_index):
             logger.error("❌ No items found in database. Exiting.")
             return
         
+        matcher = NameMatcher(name_index=name_index)
+        
         # 5. Match scraped data with database items
         logger.info("🔗 Matching scraped products with database items...")
         
-        matches_found = 0
-        exact_matches = []
-        no_matches = []
+        match_started = time.time()
+        matches, no_matches = matcher.match_all(scraped_data.keys())
         
-        for product_name, image_url in scraped_data.items():
-            if product_name in existing_items_map:
-                item_code = existing_items_map[product_name]
-                exact_matches.append((image_url, item_code))
-                matches_found += 1
-            else:
-                no_matches.append(product_name)
+        # Several scraped names can resolve to the same item - keep the most confident one
+        best_per_item: Dict[str, Tuple[float, str]] = {}
+        method_counts: Dict[str, int] = {}
+        for product_name, match in matches.items():
+            method_counts[match.method] = method_counts.get(match.method, 0) + 1
+            for item_code in match.item_codes:
+                current = best_per_item.get(item_code)
+                if current is None or match.score > current[0]:
+                    best_per_item[item_code] = (match.score, scraped_data[product_name])
         
-        logger.info(f"✅ Matching complete:")
-        logger.info(f"   Exact matches: {matches_found}")
+        exact_matches = [(image_url, item_code) for item_code, (_, image_url) in best_per_item.items()]
+        matches_found = len(exact_matches)
+        
+        logger.info(f"✅ Matching complete in {time.time() - match_started:.1f}s:")
+        for method in ("exact", "normalized", "reordered", "fuzzy"):
+            logger.info(f"   {method.capitalize()} matches: {method_counts.get(method, 0)}")
+        logger.info(f"   Grocery rows matched: {matches_found} (only rows without an image are updated)")
         logger.info(f"   No matches: {len(no_matches)}")
         
         if matches_found == 0:
@@ -264,10 +344,6 @@ async def process_image_updates():
             successful, failed = await db_updater.batch_update_images(batch)
             total_updated += successful
             total_failed += failed
-            
-            # Small delay between batches to avoid overwhelming the database
-            if i + BATCH_SIZE < len(exact_matches):
-                await asyncio.sleep(0.1)
         
         # 7. Get final statistics
         logger.info("📊 Getting final database statistics...")
@@ -282,12 +358,13 @@ async def process_image_updates():
         print("="*80)
         print(f"📊 PROCESSING SUMMARY:")
         print(f"   Scraped products loaded: {len(scraped_data)}")
-        print(f"   Database items checked: {len(existing_items_map)}")
-        print(f"   Exact matches found: {matches_found}")
+        print(f"   Database items checked: {len(name_index)}")
+        print(f"   Scraped products matched: {len(matches)} ({method_counts.get('fuzzy', 0)} fuzzy)")
+        print(f"   Grocery rows matched: {matches_found}")
         print(f"   Products with no database match: {len(no_matches)}")
         print()
         print(f"🔄 UPDATE RESULTS:")
-        print(f"   Successfully updated: {total_updated}")
+        print(f"   Successfully updated: {total_updated} (rows whose imageUrl actually changed)")
         print(f"   Failed updates: {total_failed}")
         print(f"   Update success rate: {(total_updated/matches_found)*100:.1f}%")
         print()
@@ -320,6 +397,8 @@ async def process_image_updates():
     
     finally:
         # Cleanup
+        if name_index is not None:
+            name_index.close()
         await db_updater.disconnect()
 
 
@@ -0,0 +1,176 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_FILE = "image_search_cache.db"
+NEGATIVE_CACHE_TTL_DAYS = float(os.getenv("NEGATIVE_CACHE_TTL_DAYS", "14"))
+NEGATIVE_CACHE_MAX_TTL_DAYS = float(os.getenv("NEGATIVE_CACHE_MAX_TTL_DAYS", "120"))
+IMAGE_CACHE_TTL_DAYS = float(os.getenv("IMAGE_CACHE_TTL_DAYS", "30"))
+IMAGE_CACHE_NEGATIVE_TTL_DAYS = float(os.getenv("IMAGE_CACHE_NEGATIVE_TTL_DAYS", "3"))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "50000"))
+
+QUOTE_CHARS_PATTERN = re.compile(r"[\"'`׳״]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_search_term(term: str) -> str:
+    """Normalize a search term so trivially different spellings share one cache entry."""
+    term = QUOTE_CHARS_PATTERN.sub("", term or "")
+    return WHITESPACE_PATTERN.sub(" ", term).strip().casefold()
+
+
+class NegativeSearchCache:
+    """
+    Persistent cache of search terms whose search did not find the searched item itself.
+
+    Every miss increments an attempt counter and the entry expires after
+    ttl_days * 2^(attempts - 1) (capped at max_ttl_days), so terms that keep
+    missing are retried less and less often.
+    """
+
+    def __init__(self, filename: str = SEARCH_CACHE_FILE,
+                 ttl_days: float = NEGATIVE_CACHE_TTL_DAYS,
+                 max_ttl_days: float = NEGATIVE_CACHE_MAX_TTL_DAYS):
+        self.filename = filename
+        self.ttl_seconds = ttl_days * 86400
+        self.max_ttl_seconds = max_ttl_days * 86400
+        self.connection = None
+
+    def open(self):
+        """Open (and create if needed) the cache database."""
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS negative_search (
+                term TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                last_attempt REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+        logger.info(f"✅ Negative search cache ready: {self.count_active()} active misses in {self.filename}")
+
+    def close(self):
+        """Close the cache database."""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def is_cached_miss(self, term: str) -> bool:
+        """Check whether a term is a known miss that has not expired yet."""
+        row = self.connection.execute(
+            "SELECT expires_at FROM negative_search WHERE term = ?",
+            (normalize_search_term(term),)
+        ).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def record_miss(self, term: str):
+        """Record a search that didn't find the searched item itself."""
+        key = normalize_search_term(term)
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT attempts FROM negative_search WHERE term = ?", (key,)
+        ).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        ttl = min(self.ttl_seconds * 2 ** (attempts - 1), self.max_ttl_seconds)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO negative_search (term, attempts, last_attempt, expires_at) VALUES (?, ?, ?, ?)",
+            (key, attempts, now, now + ttl)
+        )
+        self.connection.commit()
+
+    def record_hit(self, term: str):
+        """Forget a term once a search for it finds the item."""
+        self.connection.execute(
+            "DELETE FROM negative_search WHERE term = ?", (normalize_search_term(term),)
+        )
+        self.connection.commit()
+
+    def count_active(self) -> int:
+        """Count misses that are still within their TTL."""
+        row = self.connection.execute(
+            "SELECT COUNT(*) FROM negative_search WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+
+class ImageLookupCache:
+    """
+    Persistent LRU cache of image lookups (query -> image URL, or None for a miss).
+
+    Hits expire after ttl_days and misses after negative_ttl_days. Every read refreshes
+    the entry's last use, and once more than max_entries are stored the least recently
+    used ones are evicted. The connection is shared between threads behind a lock.
+    """
+
+    def __init__(self, filename: str = SEARCH_CACHE_FILE,
+                 ttl_days: float = IMAGE_CACHE_TTL_DAYS,
+                 negative_ttl_days: float = IMAGE_CACHE_NEGATIVE_TTL_DAYS,
+                 max_entries: int = IMAGE_CACHE_MAX_ENTRIES):
+        self.filename = filename
+        self.ttl_seconds = ttl_days * 86400
+        self.negative_ttl_seconds = negative_ttl_days * 86400
+        self.max_entries = max_entries
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Open (and create if needed) the cache database."""
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS image_lookup (
+                query TEXT PRIMARY KEY,
+                url TEXT,
+                last_used REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS image_lookup_last_used ON image_lookup (last_used)")
+        self.connection.commit()
+
+    def close(self):
+        """Close the cache database."""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def get(self, query: str) -> Tuple[bool, Optional[str]]:
+        """Return (found, url) for a query; url is None for a cached miss."""
+        key = normalize_search_term(query)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT url, expires_at FROM image_lookup WHERE query = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return False, None
+            self.connection.execute("UPDATE image_lookup SET last_used = ? WHERE query = ?", (now, key))
+            self.connection.commit()
+        return True, row[0]
+
+    def put(self, query: str, url: Optional[str]):
+        """Store the result of a lookup (None records a miss) and evict beyond max_entries."""
+        key = normalize_search_term(query)
+        now = time.time()
+        ttl = self.ttl_seconds if url else self.negative_ttl_seconds
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO image_lookup (query, url, last_used, expires_at) VALUES (?, ?, ?, ?)",
+                (key, url, now, now + ttl)
+            )
+            self.connection.execute(
+                "DELETE FROM image_lookup WHERE query IN ("
+                "SELECT query FROM image_lookup ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.connection.commit()
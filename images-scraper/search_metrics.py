@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = os.getenv("IMAGE_METRICS_FILE", "scrape_metrics.jsonl")
+STAGES = ("navigation", "grid_wait", "extraction", "validation")
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)  # Upper bounds in seconds; the last column is "more"
+OUTCOMES = ("hit", "miss", "failed")  # hit: the searched item itself was found, not just other products
+
+
+class SearchTrace:
+    """Timing of one search: seconds spent per stage, summed over retries and fallbacks."""
+
+    def __init__(self, worker: Optional[int], term: str):
+        self.worker = worker
+        self.term = term
+        self.source: Optional[str] = None  # "barcode", "http" or "browser" - whichever answered
+        self.spans: Dict[str, float] = {}
+        self.timeouts = 0
+        self.started = time.monotonic()
+
+    def add(self, stage: str, seconds: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - started)
+
+
+def span(trace: Optional[SearchTrace], stage: str):
+    """Time a stage of trace (no-op without a trace)."""
+    return trace.span(stage) if trace else nullcontext()
+
+
+def mark_timeout(trace: Optional[SearchTrace]):
+    if trace:
+        trace.timeouts += 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class MetricsSummary:
+    """Aggregates search records (live or read back from a metrics file) into the run report."""
+
+    def __init__(self):
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+        self.pages_with_products = 0
+        self.sources: Dict[str, int] = {}
+        self.timeouts = 0
+        self.searches_with_timeouts = 0
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in ("total",) + STAGES}
+        self.workers: Dict[str, Dict[str, float]] = {}  # worker -> count, first and last timestamp
+
+    def add(self, record: Dict):
+        self.outcomes[record['outcome']] = self.outcomes.get(record['outcome'], 0) + 1
+        self.pages_with_products += bool(record.get('products'))
+        source = record.get('source') or "none"
+        self.sources[source] = self.sources.get(source, 0) + 1
+        self.timeouts += record.get('timeouts', 0)
+        self.searches_with_timeouts += bool(record.get('timeouts'))
+        self.latencies['total'].append(record['seconds'])
+        for stage, seconds in record.get('spans', {}).items():
+            self.latencies.setdefault(stage, []).append(seconds)
+
+        worker = self.workers.setdefault(str(record.get('worker')), {'count': 0, 'first': record['started'], 'last': 0.0})
+        worker['count'] += 1
+        worker['first'] = min(worker['first'], record['started'])
+        worker['last'] = max(worker['last'], record['ts'])
+
+    @property
+    def searches(self) -> int:
+        return len(self.latencies['total'])
+
+    def searches_per_minute(self, worker: Dict[str, float]) -> float:
+        return worker['count'] * 60 / max(worker['last'] - worker['first'], 1e-9)
+
+    def report_lines(self) -> List[str]:
+        if not self.searches:
+            return ["📈 No searches recorded."]
+        started = min(worker['first'] for worker in self.workers.values())
+        finished = max(worker['last'] for worker in self.workers.values())
+        overall_rate = self.searches * 60 / max(finished - started, 1e-9)
+        lines = [
+            f"📈 SEARCH METRICS: {self.searches} searches in {(finished - started) / 60:.1f} min ({overall_rate:.1f}/min)",
+            f"   🎯 Hit rate: {self.outcomes['hit'] / self.searches * 100:.1f}% "
+            f"(hits {self.outcomes['hit']}, misses {self.outcomes['miss']}, failed {self.outcomes['failed']}; "
+            f"{self.pages_with_products} result pages had products)",
+            f"   ⏰ Timeouts: {self.timeouts} in {self.searches_with_timeouts} searches",
+            f"   🔀 Answered by: " + ", ".join(f"{source} {count}" for source, count in sorted(self.sources.items())),
+            "   🤖 Searches/min per worker: " + ", ".join(
+                f"#{worker} {self.searches_per_minute(stats):.1f}"
+                for worker, stats in sorted(self.workers.items(), key=lambda item: (len(item[0]), item[0]))
+            ),
+        ]
+
+        bucket_labels = [f"≤{bound}s" for bound in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}s"]
+        lines.append("   ⏱️  Latency (s)  " + " ".join(f"{label:>7}" for label in
+                                                      ["count", "p50", "p90", "p99", "max"] + bucket_labels))
+        for stage, values in self.latencies.items():
+            if not values:
+                continue
+            values = sorted(values)
+            buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+            for value in values:
+                buckets[next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if value <= bound), -1)] += 1
+            columns = [str(len(values))] + [f"{value:.2f}" for value in (
+                percentile(values, 0.5), percentile(values, 0.9), percentile(values, 0.99), values[-1]
+            )] + [str(count) for count in buckets]
+            lines.append(f"      {stage:<11}" + " ".join(f"{column:>7}" for column in columns))
+        return lines
+
+
+class SearchMetrics:
+    """
+    Records one JSONL line per search (stage spans, source, outcome, timeouts) to a metrics
+    file and keeps a MetricsSummary for the end-of-run report. Lines carry a run id, so
+    runs appended to the same file can be reported and compared separately.
+    """
+
+    def __init__(self, filename: str = METRICS_FILE):
+        self.filename = filename
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.summary = MetricsSummary()
+        self.file = None
+
+    def open(self):
+        self.file = open(self.filename, 'a', encoding='utf-8')
+        logger.info(f"📈 Recording search metrics to {self.filename} (run {self.run_id})")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def start(self, worker: Optional[int], term: str) -> SearchTrace:
+        return SearchTrace(worker, term)
+
+    def finish(self, trace: SearchTrace, products: Optional[Dict[str, str]], found: bool = False):
+        """
+        Record a finished search; products is the search result (None when it failed) and
+        found whether the searched item itself was among them.
+        """
+        now = time.time()
+        seconds = time.monotonic() - trace.started
+        record = {
+            'run': self.run_id,
+            'started': round(now - seconds, 3),
+            'ts': round(now, 3),
+            'worker': trace.worker,
+            'term': trace.term,
+            'source': trace.source,
+            'outcome': "failed" if products is None else ("hit" if found else "miss"),
+            'products': len(products or {}),
+            'timeouts': trace.timeouts,
+            'seconds': round(seconds, 4),
+            'spans': {stage: round(value, 4) for stage, value in trace.spans.items()}
+        }
+        self.summary.add(record)
+        if self.file:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def log_report(self):
+        for line in self.summary.report_lines():
+            logger.info(line)
+
+
+def read_summaries(filename: str) -> Dict[str, MetricsSummary]:
+    """Summaries per run id of a metrics file."""
+    summaries: Dict[str, MetricsSummary] = {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line of an interrupted run
+            summaries.setdefault(record.get('run', "?"), MetricsSummary()).add(record)
+    return summaries
+
+
+def print_reports(summaries: Iterable):
+    for run_id, summary in summaries:
+        print(f"\n🏁 Run {run_id}")
+        for line in summary.report_lines():
+            print(line)
+
+
+if __name__ == "__main__":
+    # Usage: python search_metrics.py [metrics file] [run id ...]
+    filename = sys.argv[1] if len(sys.argv) > 1 else METRICS_FILE
+    summaries = read_summaries(filename)
+    selected = sys.argv[2:] or list(summaries)
+    print_reports((run_id, summaries[run_id]) for run_id in selected if run_id in summaries)
@@ -0,0 +1,249 @@
+import os
+import sys
+import uuid
+import socket
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+from image_db import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TABLE = "image_scrape_queue"
+LEASE_SECONDS = int(os.getenv("WORK_QUEUE_LEASE_SECONDS", "300"))
+CLAIM_BATCH_SIZE = int(os.getenv("WORK_QUEUE_BATCH_SIZE", "200"))
+MAX_ATTEMPTS = 3  # Items whose lease expires or whose search fails this many times are marked failed
+RETRY_AFTER_HOURS = int(os.getenv("WORK_QUEUE_RETRY_AFTER_HOURS", "168"))  # Done/failed items still without an image are queued again after this
+ENQUEUE_CHUNK_SIZE = 2000
+
+CREATE_QUEUE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {QUEUE_TABLE} (
+        itemCode VARCHAR(20) NOT NULL PRIMARY KEY,
+        itemName VARCHAR(100) NOT NULL,
+        priority DOUBLE NOT NULL DEFAULT 0,
+        status VARCHAR(10) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        leaseToken CHAR(32) NULL,
+        leaseOwner VARCHAR(100) NULL,
+        leaseExpiresAt DATETIME NULL,
+        imageUrl VARCHAR(500) NULL,
+        updatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_queue_status_priority (status, priority),
+        INDEX idx_queue_lease_token (leaseToken)
+    ) CHARACTER SET utf8mb4
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """A batch of claimed items; the token identifies the claim in renew() and complete()."""
+
+    def __init__(self, token: str, items: List[Tuple[str, str]]):
+        self.token = token
+        self.items = items  # (itemCode, itemName)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class WorkQueue:
+    """
+    MySQL-backed work queue shared by image scraping workers on any number of hosts.
+
+    Workers claim batches with a single UPDATE ... ORDER BY priority LIMIT n, which stamps
+    the rows with a random lease token and an expiry time, so concurrent claims never
+    overlap. A worker renews its lease while it works and completes the batch with the
+    same token. Leases that expire (crashed or stuck workers) and items whose search
+    failed are claimable again, until an item has been tried MAX_ATTEMPTS times and is
+    marked failed.
+    """
+
+    def __init__(self, db: AsyncDatabase, worker_id: Optional[str] = None, lease_seconds: int = LEASE_SECONDS):
+        self.db = db
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+
+    async def create_table(self):
+        await self.db.execute(CREATE_QUEUE_TABLE)
+
+    async def enqueue(self, items: Sequence[Tuple[str, str, float]]) -> int:
+        """
+        Add (itemCode, itemName, priority) items. Items already queued keep their status,
+        only their priority is refreshed. Returns the number of rows inserted or changed.
+        """
+        changed = 0
+        for start in range(0, len(items), ENQUEUE_CHUNK_SIZE):
+            chunk = items[start:start + ENQUEUE_CHUNK_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+            changed += await self.db.execute(
+                f"INSERT INTO {QUEUE_TABLE} (itemCode, itemName, priority) VALUES {placeholders} "
+                f"ON DUPLICATE KEY UPDATE priority = VALUES(priority)",
+                [value for item in chunk for value in item]
+            )
+        return changed
+
+    async def claim(self, batch_size: int = CLAIM_BATCH_SIZE) -> Optional[Lease]:
+        """Lease up to batch_size pending (or expired) items, highest priority first."""
+        await self.db.execute(
+            f"UPDATE {QUEUE_TABLE} SET status = 'failed', leaseToken = NULL, leaseOwner = NULL "
+            f"WHERE status = 'leased' AND leaseExpiresAt < NOW() AND attempts >= %s",
+            (MAX_ATTEMPTS,)
+        )
+
+        token = uuid.uuid4().hex
+        claimed = await self.db.execute(
+            f"UPDATE {QUEUE_TABLE} SET status = 'leased', leaseToken = %s, leaseOwner = %s, "
+            f"leaseExpiresAt = NOW() + INTERVAL %s SECOND, attempts = attempts + 1 "
+            f"WHERE status = 'pending' OR (status = 'leased' AND leaseExpiresAt < NOW()) "
+            f"ORDER BY priority DESC, itemCode LIMIT %s",
+            (token, self.worker_id, self.lease_seconds, batch_size)
+        )
+        if not claimed:
+            return None
+
+        rows = await self.db.fetch_all(
+            f"SELECT itemCode, itemName FROM {QUEUE_TABLE} WHERE leaseToken = %s ORDER BY priority DESC, itemCode",
+            (token,)
+        )
+        logger.info(f"📥 {self.worker_id} leased {len(rows)} items for {self.lease_seconds}s")
+        return Lease(token, [(row['itemCode'], row['itemName']) for row in rows])
+
+    async def renew(self, lease: Lease) -> int:
+        """Extend a lease (heartbeat). Returns how many items are still held by it."""
+        return await self.db.execute(
+            f"UPDATE {QUEUE_TABLE} SET leaseExpiresAt = NOW() + INTERVAL %s SECOND "
+            f"WHERE leaseToken = %s AND status = 'leased'",
+            (self.lease_seconds, lease.token)
+        )
+
+    async def complete(self, lease: Lease, results: Dict[str, Optional[str]]) -> int:
+        """
+        Mark the lease's searched items done, storing the image found for each itemCode in
+        results (None for a miss). Items missing from results (their search failed) go back to
+        pending, or to failed after MAX_ATTEMPTS tries. Items whose lease was lost to another
+        worker are left alone. Returns the rows marked done.
+        """
+        if not lease.items:
+            return 0
+        done = [(results[item_code], item_code, lease.token) for item_code, _ in lease.items if item_code in results]
+        retry = [(MAX_ATTEMPTS, item_code, lease.token) for item_code, _ in lease.items if item_code not in results]
+
+        def call(connection):
+            cursor = connection.cursor()
+            try:
+                completed = 0
+                if done:
+                    cursor.executemany(
+                        f"UPDATE {QUEUE_TABLE} SET status = 'done', imageUrl = %s, leaseToken = NULL, "
+                        f"leaseOwner = NULL, leaseExpiresAt = NULL WHERE itemCode = %s AND leaseToken = %s",
+                        done
+                    )
+                    completed = cursor.rowcount
+                if retry:
+                    cursor.executemany(
+                        f"UPDATE {QUEUE_TABLE} SET status = IF(attempts >= %s, 'failed', 'pending'), "
+                        f"leaseToken = NULL, leaseOwner = NULL, leaseExpiresAt = NULL "
+                        f"WHERE itemCode = %s AND leaseToken = %s",
+                        retry
+                    )
+                connection.commit()
+                return completed
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        return await self.db.run(call)
+
+    async def release(self, lease: Lease):
+        """Give the lease's unfinished items back to the queue right away (e.g. on shutdown)."""
+        await self.db.execute(
+            f"UPDATE {QUEUE_TABLE} SET status = 'pending', leaseToken = NULL, leaseOwner = NULL, "
+            f"leaseExpiresAt = NULL, attempts = GREATEST(attempts - 1, 0) WHERE leaseToken = %s AND status = 'leased'",
+            (lease.token,)
+        )
+
+    async def requeue_missing(self, retry_after_hours: int = RETRY_AFTER_HOURS) -> int:
+        """
+        Put done and failed items whose grocery row still has no image back to pending
+        (once they have rested retry_after_hours). Returns the rows requeued.
+        """
+        return await self.db.execute(
+            f"UPDATE {QUEUE_TABLE} q JOIN grocery g ON g.itemCode = q.itemCode "
+            f"SET q.status = 'pending', q.attempts = 0, q.imageUrl = NULL "
+            f"WHERE q.status IN ('done', 'failed') AND (g.imageUrl IS NULL OR g.imageUrl = '') "
+            f"AND q.updatedAt < NOW() - INTERVAL %s HOUR",
+            (retry_after_hours,)
+        )
+
+    async def drop_filled(self) -> int:
+        """Remove pending items whose grocery row got an image in the meantime. Returns the rows removed."""
+        return await self.db.execute(
+            f"DELETE q FROM {QUEUE_TABLE} q JOIN grocery g ON g.itemCode = q.itemCode "
+            f"WHERE q.status = 'pending' AND g.imageUrl IS NOT NULL AND g.imageUrl != ''"
+        )
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await self.db.fetch_all(f"SELECT status, COUNT(*) AS n FROM {QUEUE_TABLE} GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    async def heartbeat(self, lease: Lease, interval: Optional[float] = None):
+        """Renew the lease periodically until cancelled (run as a background task)."""
+        interval = interval or self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                held = await self.renew(lease)
+                logger.debug(f"💓 Renewed lease {lease.token[:8]} ({held} items)")
+            except Exception as e:
+                logger.warning(f"⚠️  Lease renewal failed: {e}")
+
+
+async def refresh_queue(db: AsyncDatabase) -> int:
+    """
+    Queue every grocery item without an image, prioritized by popularity. Pending items that
+    got an image since are dropped, and done or failed items that still have none are retried.
+    """
+    from find_grocery_image import DatabaseManager  # Ranking query lives with the other grocery reads
+
+    queue = WorkQueue(db)
+    await queue.create_table()
+    db_manager = DatabaseManager()
+    db_manager.db = db
+
+    dropped = await queue.drop_filled()
+    requeued = await queue.requeue_missing()
+    logger.info(f"🧹 Dropped {dropped} pending items that have an image now, requeued {requeued} items still without one")
+
+    queued = 0
+    rank = 0
+    async for batch in db_manager.iter_items_by_popularity():
+        items = []
+        for item_code, item_name in batch:
+            # Priority falls with the rank, so claims follow the popularity order
+            items.append((item_code, item_name, -float(rank)))
+            rank += 1
+        queued += await queue.enqueue(items)
+    logger.info(f"✅ Queue refreshed: {rank} items without images ({queued} rows inserted or reprioritized)")
+    return rank
+
+
+async def main():
+    db = AsyncDatabase(pool_name="work_queue")
+    await db.connect()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "refresh":
+            await refresh_queue(db)
+        queue = WorkQueue(db)
+        await queue.create_table()
+        print(f"📊 {QUEUE_TABLE}: {await queue.counts()}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())